@@ -0,0 +1,469 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from . import metrics
+
+# Segment files roll over once they pass this size; names carry the first seq.
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+# A snapshot of the full state is written after this many events.
+SNAPSHOT_EVERY = 10_000
+# Upper bound on records written (and acknowledged) per fsync.
+GROUP_COMMIT_MAX_EVENTS = 4096
+SNAPSHOTS_KEPT = 2
+
+# Each record: payload length, CRC32 of the payload, then the JSON payload.
+RECORD_HEADER = struct.Struct("<II")
+
+Record = Dict
+# Snapshot state, or a function producing it that runs on the snapshot thread.
+State = Union[Dict, Callable[[], Dict]]
+
+
+class EventLogCorrupt(RuntimeError):
+    pass
+
+
+class _Pending(NamedTuple):
+    """A queued unit: records written together, or a snapshot (`state` set, no records)."""
+
+    seq: int  # first seq of the records, or the last seq a snapshot covers
+    count: int
+    data: Optional[bytes]
+    # (index key, byte offset within `data`) of each record that has a key
+    keys: List[Tuple[str, int]]
+    future: Optional[Future]
+    state: Optional[State]
+
+
+def encode_record(record: Record) -> bytes:
+    payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_records(path: Path) -> Iterator[Tuple[int, Optional[Record]]]:
+    """Yield (offset, record) for each intact record; a torn or corrupt record yields (offset, None) and stops."""
+    with open(path, "rb") as fh:
+        data = fh.read()
+    offset = 0
+    while offset < len(data):
+        if offset + RECORD_HEADER.size > len(data):
+            yield offset, None
+            return
+        length, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            yield offset, None
+            return
+        yield offset, json.loads(payload)
+        offset = start + length
+
+
+def _fsync_dir(path: Path) -> None:
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class EventLog:
+    """Append-only, segmented, durable log of `{seq, ts, type, data}` records.
+
+    `submit` assigns the next sequence number and queues the record; one writer
+    thread drains everything queued since its last flush into a single
+    write + fsync (group commit) and then resolves the returned futures, so
+    concurrent appenders share fsyncs instead of paying one each.
+    `submit_batch` queues several records as one unit that is never split
+    across writes or segments.
+
+    Snapshots of caller-provided state are queued behind the records they
+    cover and written atomically by a separate thread, so serialising a large
+    state stalls neither the caller nor group commit. A snapshot may cover
+    fewer records than were submitted before it; replay starts after the last
+    record it covers. `recover` returns the latest snapshot plus the records
+    after it; a torn record at the tail of the last segment (crash mid-write)
+    is truncated away. A write that fails at runtime is cut off the segment
+    the same way before the writer accepts more appends; records flushed
+    before it still succeed.
+
+    With `index_key`, the segment and offset of every record whose data has
+    that key are kept in memory, so `read_indexed` fetches one key's records
+    without scanning the log. Each full segment gets an index file next to it;
+    `recover` loads those for segments the snapshot covers, so startup only
+    scans the records it replays.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        fsync: bool = True,
+        segment_bytes: int = SEGMENT_MAX_BYTES,
+        snapshot_every: int = SNAPSHOT_EVERY,
+        max_batch: int = GROUP_COMMIT_MAX_EVENTS,
+        index_key: Optional[str] = None,
+    ):
+        self.directory = Path(directory)
+        self.fsync = fsync
+        self.segment_bytes = segment_bytes
+        self.snapshot_every = snapshot_every
+        self.max_batch = max_batch
+        self.index_key = index_key
+        self.next_seq = 1
+        self.snapshot_seq = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending: List[_Pending] = []
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+        self._snapshotter: Optional[threading.Thread] = None
+        self._segment = None
+        self._segment_file: Optional[Path] = None
+        self._segment_size = 0
+        # Set when a failed write could not be cut back off the segment; appends are refused from then on.
+        self._broken: Optional[BaseException] = None
+        # index key -> [(segment, offset)] of its durable records, oldest first
+        self._index: Dict[str, List[Tuple[Path, int]]] = {}
+        # (index key, offset) of every record queued to the open segment, for its index file
+        self._segment_keys: List[Tuple[str, int]] = []
+
+    # ---------- recovery --------------------------------------------------
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob("events-*.log"))
+
+    def recover(self) -> Tuple[Optional[Dict], List[Record]]:
+        """Latest snapshot state (or None) and the records after it, in order. Call before `start`."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        state = None
+        for path in sorted(self.directory.glob("snapshot-*.json"), reverse=True):
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    snapshot = json.load(fh)
+            except (OSError, ValueError):
+                continue  # half-written snapshots never get renamed into place, but be lenient
+            self.snapshot_seq, state = snapshot["seq"], snapshot["state"]
+            break
+
+        tail: List[Record] = []
+        last_seq = self.snapshot_seq
+        segments = self.segments()
+        self._index = {}
+        for idx, path in enumerate(segments):
+            full = idx + 1 < len(segments)
+            covered = full and _first_seq(segments[idx + 1]) <= self.snapshot_seq + 1
+            if covered and (self.index_key is None or self._load_segment_index(path)):
+                continue  # entirely covered by the snapshot, and its index (if any) is on file
+            entries: List[Tuple[str, int]] = []
+            for offset, record in read_records(path):
+                if record is None:
+                    if full:
+                        raise EventLogCorrupt(f"Corrupt record in {path.name} at byte {offset}")
+                    with open(path, "r+b") as fh:
+                        fh.truncate(offset)
+                    break
+                key = self._key_of(record["data"])
+                if key is not None:
+                    self._index.setdefault(key, []).append((path, offset))
+                    entries.append((key, offset))
+                if record["seq"] > self.snapshot_seq:
+                    tail.append(record)
+                last_seq = max(last_seq, record["seq"])
+            if not full:
+                self._segment_keys = entries
+            elif self.index_key is not None and not path.with_suffix(".idx").exists():
+                self._write_segment_index(path, entries)
+        self.next_seq = last_seq + 1
+        return state, tail
+
+    def read(self, since_seq: int = 0) -> Iterator[Record]:
+        """Every durable record with seq > `since_seq`, oldest first (scans the segment files)."""
+        segments = self.segments()
+        for idx, path in enumerate(segments):
+            if idx + 1 < len(segments) and _first_seq(segments[idx + 1]) <= since_seq + 1:
+                continue
+            for _, record in read_records(path):
+                if record is None:
+                    break
+                if record["seq"] > since_seq:
+                    yield record
+
+    def read_indexed(self, key: str) -> List[Record]:
+        """Every durable record whose `index_key` is `key`, oldest first, read from its offset."""
+        with self._lock:
+            entries = list(self._index.get(key, ()))
+        records = []
+        for path, group in groupby(entries, key=itemgetter(0)):
+            with open(path, "rb") as fh:
+                for _, offset in group:
+                    fh.seek(offset)
+                    length, _ = RECORD_HEADER.unpack(fh.read(RECORD_HEADER.size))
+                    records.append(json.loads(fh.read(length)))
+        return records
+
+    def _load_segment_index(self, path: Path) -> bool:
+        """Add a full segment's index file to the index; False if it is missing or does not match the segment."""
+        try:
+            with open(path.with_suffix(".idx"), encoding="utf-8") as fh:
+                saved = json.load(fh)
+            if saved["size"] != path.stat().st_size:
+                return False
+            keys = saved["keys"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        for key, offsets in keys.items():
+            self._index.setdefault(key, []).extend((path, offset) for offset in offsets)
+        return True
+
+    def _write_segment_index(self, path: Path, entries: List[Tuple[str, int]]) -> None:
+        keys: Dict[str, List[int]] = {}
+        for key, offset in entries:
+            keys.setdefault(key, []).append(offset)
+        target = path.with_suffix(".idx")
+        tmp = target.with_suffix(".idx.tmp")
+        try:
+            # Not fsynced: a lost or stale index file fails the size check and the segment is scanned instead.
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump({"size": path.stat().st_size, "keys": keys}, fh, separators=(",", ":"))
+            os.replace(tmp, target)
+        except OSError:
+            pass
+
+    def _key_of(self, data) -> Optional[str]:
+        if self.index_key is None or not isinstance(data, dict):
+            return None
+        return data.get(self.index_key)
+
+    # ---------- appending -------------------------------------------------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._closing = False
+        segments = self.segments()
+        self._open_segment(segments[-1] if segments else self._segment_path(self.next_seq))
+        self._thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, event_type: str, data: Dict, ts: Optional[float] = None) -> Future:
+        """Queue one record; the future resolves to its seq once it is on disk."""
+        return self.submit_batch([(event_type, data)], ts)
+
+    def submit_batch(self, events: List[Tuple[str, Dict]], ts: Optional[float] = None) -> Future:
+        """Queue `(type, data)` records as one unit; the future resolves to the last seq once all are on disk."""
+        future: Future = Future()
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            if self._closing or self._thread is None:
+                raise RuntimeError("Event log is not running")
+            if self._broken is not None:
+                raise RuntimeError(f"Event log failed: {self._broken}")
+            first = self.next_seq
+            self.next_seq += len(events)
+            data = bytearray()
+            keys = []
+            for i, (event_type, payload) in enumerate(events):
+                key = self._key_of(payload)
+                if key is not None:
+                    keys.append((key, len(data)))
+                data += encode_record({"seq": first + i, "ts": ts, "type": event_type, "data": payload})
+            self._pending.append(_Pending(first, len(events), bytes(data), keys, future, None))
+            self._wakeup.notify()
+        return future
+
+    async def append(self, event_type: str, data: Dict) -> int:
+        return await asyncio.wrap_future(self.submit(event_type, data))
+
+    def snapshot_due(self) -> bool:
+        return self.next_seq - 1 - self.snapshot_seq >= self.snapshot_every
+
+    def snapshot(self, state: State, seq: Optional[int] = None) -> None:
+        """Queue a snapshot of `state`, which must reflect every record up to `seq` (default: all submitted so far).
+
+        Pass a callable to defer building the state to the snapshot thread.
+        """
+        with self._lock:
+            seq = self.next_seq - 1 if seq is None else seq
+            self.snapshot_seq = seq
+            self._pending.append(_Pending(seq, 0, None, [], None, state))
+            self._wakeup.notify()
+
+    def close(self, state: Optional[State] = None, seq: Optional[int] = None) -> None:
+        """Flush everything queued (plus an optional final snapshot up to `seq`) and stop the writer."""
+        if self._thread is None:
+            return
+        if state is not None and self.next_seq - 1 > self.snapshot_seq:
+            self.snapshot(state, seq)
+        with self._lock:
+            self._closing = True
+            self._wakeup.notify()
+        self._thread.join()
+        self._thread = None
+        if self._snapshotter is not None:
+            self._snapshotter.join()
+            self._snapshotter = None
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    # ---------- writer thread ---------------------------------------------
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending and not self._closing:
+                    self._wakeup.wait()
+                if not self._pending:
+                    return
+                # Whole units only, at least one, up to max_batch records.
+                taken = records = 0
+                for unit in self._pending:
+                    if taken and records + unit.count > self.max_batch:
+                        break
+                    records += unit.count
+                    taken += 1
+                batch = self._pending[:taken]
+                del self._pending[:taken]
+            self._commit(batch)
+
+    def _commit(self, batch: List[_Pending]) -> None:
+        if self._broken is not None:
+            self._fail(batch, RuntimeError(f"Event log failed: {self._broken}"))
+            return
+        buffer = bytearray()
+        # (unit, segment, offset of the unit in it) for every unit put in `buffer`
+        queued: List[Tuple[_Pending, Path, int]] = []
+        durable = 0  # leading units of `queued` already flushed
+        try:
+            for unit in batch:
+                if unit.state is not None:
+                    self._flush(buffer)
+                    buffer.clear()
+                    durable = len(queued)
+                    self._start_snapshot(unit.seq, unit.state)
+                    continue
+                if self._segment_size + len(buffer) >= self.segment_bytes:
+                    self._flush(buffer)
+                    buffer.clear()
+                    durable = len(queued)
+                    self._segment.close()
+                    if self.index_key is not None:
+                        self._write_segment_index(self._segment_file, self._segment_keys)
+                    self._segment_keys = []
+                    self._open_segment(self._segment_path(unit.seq))
+                base = self._segment_size + len(buffer)
+                queued.append((unit, self._segment_file, base))
+                self._segment_keys.extend((key, base + offset) for key, offset in unit.keys)
+                buffer += unit.data
+            self._flush(buffer)
+            durable = len(queued)
+        except Exception as exc:
+            self._discard_unflushed()
+            self._resolve(queued[:durable])
+            self._fail(batch, exc)
+            return
+        self._resolve(queued)
+
+    def _resolve(self, written: List[Tuple[_Pending, Path, int]]) -> None:
+        if not written:
+            return
+        with self._lock:
+            for unit, path, base in written:
+                for key, offset in unit.keys:
+                    self._index.setdefault(key, []).append((path, base + offset))
+        records = sum(unit.count for unit, _, _ in written)
+        metrics.EVENT_LOG_BATCH_SIZE.observe(records)
+        metrics.EVENT_LOG_APPENDS.inc(records)
+        for unit, _, _ in written:
+            unit.future.set_result(unit.seq + unit.count - 1)
+
+    @staticmethod
+    def _fail(batch: List[_Pending], exc: BaseException) -> None:
+        for unit in batch:
+            if unit.future is not None and not unit.future.done():
+                unit.future.set_exception(exc)
+
+    def _discard_unflushed(self) -> None:
+        """After a failed write, cut the segment back to its last flushed offset before anything else is appended.
+
+        If even that fails, the log refuses further appends rather than write them after a torn record.
+        """
+        try:
+            try:
+                self._segment.close()
+            except OSError:
+                pass  # the rest of the failed write, still buffered; truncated below either way
+            with open(self._segment_file, "r+b") as fh:
+                fh.truncate(self._segment_size)
+                if self.fsync:
+                    os.fsync(fh.fileno())
+            self._segment_keys = [entry for entry in self._segment_keys if entry[1] < self._segment_size]
+            self._open_segment(self._segment_file)
+        except Exception as exc:
+            with self._lock:
+                self._broken = exc
+
+    def _flush(self, buffer: bytearray) -> None:
+        if not buffer:
+            return
+        self._segment.write(buffer)
+        self._segment.flush()
+        if self.fsync:
+            started = time.perf_counter()
+            os.fsync(self._segment.fileno())
+            metrics.EVENT_LOG_FSYNC_SECONDS.observe(time.perf_counter() - started)
+        self._segment_size += len(buffer)
+
+    def _segment_path(self, first_seq: int) -> Path:
+        return self.directory / f"events-{first_seq:020d}.log"
+
+    def _open_segment(self, path: Path) -> None:
+        created = not path.exists()
+        self._segment = open(path, "ab")
+        self._segment_file = path
+        self._segment_size = self._segment.tell()
+        if created and self.fsync:
+            _fsync_dir(self.directory)
+
+    def _start_snapshot(self, seq: int, state: State) -> None:
+        if self._snapshotter is not None:
+            self._snapshotter.join()  # one at a time, in order
+        self._snapshotter = threading.Thread(
+            target=self._write_snapshot, args=(seq, state), name="event-log-snapshot", daemon=True
+        )
+        self._snapshotter.start()
+
+    def _write_snapshot(self, seq: int, state: State) -> None:
+        if callable(state):
+            state = state()
+        path = self.directory / f"snapshot-{seq:020d}.json"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"seq": seq, "ts": time.time(), "state": state}, fh, separators=(",", ":"))
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+        os.replace(tmp, path)
+        if self.fsync:
+            _fsync_dir(self.directory)
+        for old in sorted(self.directory.glob("snapshot-*.json"))[:-SNAPSHOTS_KEPT]:
+            old.unlink()
+
+
+def _first_seq(path: Path) -> int:
+    return int(path.stem.split("-", 1)[1])
+
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import json
+from typing import AsyncIterator, Dict, Iterator, List, Literal, Optional, Sequence
+
+from .schemas import OrderOut
+
+ExportFormat = Literal["ndjson", "csv", "columnar"]
+Granularity = Literal["order", "segment"]
+
+EXPORT_CHUNK_SIZE = 100
+
+MEDIA_TYPES: Dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "columnar": "application/x-ndjson",
+}
+
+ORDER_COLUMNS = [
+    "order_id", "status", "customer_name", "origin_district", "destination_district", "package_type",
+    "priority", "preferred_vehicle", "max_hops", "segments", "current_checkpoint", "first_checkpoint",
+    "last_checkpoint", "total_cost_inr", "total_eta_minutes", "total_distance_km", "fuel_index",
+]
+SEGMENT_COLUMNS = [
+    "order_id", "status", "origin_district", "destination_district", "priority", "segment_index", "completed",
+    "from_id", "from_name", "from_district", "to_id", "to_name", "to_district", "vehicle_type", "driver_id",
+    "distance_km", "eta_minutes", "cost_inr", "handoff_checkpoint",
+]
+
+
+def order_rows(order: OrderOut) -> Iterator[Dict]:
+    request, plan = order.request, order.plan
+    yield {
+        "order_id": order.id,
+        "status": order.status,
+        "customer_name": request.customer_name,
+        "origin_district": request.origin_district,
+        "destination_district": request.destination_district,
+        "package_type": request.package_type,
+        "priority": request.priority,
+        "preferred_vehicle": request.preferred_vehicle,
+        "max_hops": request.max_hops,
+        "segments": len(plan.segments),
+        "current_checkpoint": order.current_checkpoint,
+        "first_checkpoint": plan.checkpoints[0] if plan.checkpoints else None,
+        "last_checkpoint": plan.checkpoints[-1] if plan.checkpoints else None,
+        "total_cost_inr": plan.total_cost_inr,
+        "total_eta_minutes": plan.total_eta_minutes,
+        "total_distance_km": plan.total_distance_km,
+        "fuel_index": plan.fuel_index,
+    }
+
+
+def segment_rows(order: OrderOut, vehicle_type: Optional[str] = None) -> Iterator[Dict]:
+    request = order.request
+    for idx, seg in enumerate(order.plan.segments):
+        if vehicle_type and seg.vehicle_type != vehicle_type:
+            continue
+        yield {
+            "order_id": order.id,
+            "status": order.status,
+            "origin_district": request.origin_district,
+            "destination_district": request.destination_district,
+            "priority": request.priority,
+            "segment_index": idx,
+            "completed": idx < order.current_checkpoint,
+            "from_id": seg.from_.id,
+            "from_name": seg.from_.name,
+            "from_district": seg.from_.district_code,
+            "to_id": seg.to.id,
+            "to_name": seg.to.name,
+            "to_district": seg.to.district_code,
+            "vehicle_type": seg.vehicle_type,
+            "driver_id": seg.driver.id,
+            "distance_km": seg.distance_km,
+            "eta_minutes": seg.eta_minutes,
+            "cost_inr": seg.cost_inr,
+            "handoff_checkpoint": seg.handoff_checkpoint,
+        }
+
+
+def matches(order: OrderOut, filters: Dict[str, Optional[str]]) -> bool:
+    request = order.request
+    if filters.get("status") and order.status != filters["status"]:
+        return False
+    if filters.get("origin_district") and request.origin_district != filters["origin_district"]:
+        return False
+    if filters.get("destination_district") and request.destination_district != filters["destination_district"]:
+        return False
+    if filters.get("priority") and request.priority != filters["priority"]:
+        return False
+    vehicle_type = filters.get("vehicle_type")
+    if vehicle_type and not any(seg.vehicle_type == vehicle_type for seg in order.plan.segments):
+        return False
+    return True
+
+
+async def stream_export(
+    orders: Dict[str, OrderOut],
+    order_ids: Sequence[str],
+    fmt: ExportFormat,
+    granularity: Granularity,
+    filters: Dict[str, Optional[str]],
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> AsyncIterator[str]:
+    """Yield the export one chunk of orders at a time.
+
+    `order_ids` is the append-only creation log, read by index up to its length
+    when the export started: orders created meanwhile are appended past that
+    point and never disturb the iteration, and nothing is copied up front. The
+    generator yields to the event loop after every chunk so order creation keeps
+    running, and memory stays bounded by one chunk.
+    """
+    columns = ORDER_COLUMNS if granularity == "order" else SEGMENT_COLUMNS
+    end = len(order_ids)
+    if fmt == "csv":
+        yield _csv_line(columns)
+    elif fmt == "columnar":
+        yield json.dumps({"schema": columns, "granularity": granularity}) + "\n"
+
+    for start in range(0, end, chunk_size):
+        rows: List[Dict] = []
+        for order_id in order_ids[start:min(start + chunk_size, end)]:
+            order = orders.get(order_id)
+            if order is None or not matches(order, filters):
+                continue
+            if granularity == "order":
+                rows.extend(order_rows(order))
+            else:
+                rows.extend(segment_rows(order, filters.get("vehicle_type")))
+        if rows:
+            yield _encode(rows, columns, fmt)
+        await asyncio.sleep(0)
+
+
+def _encode(rows: List[Dict], columns: List[str], fmt: ExportFormat) -> str:
+    if fmt == "ndjson":
+        return "".join(json.dumps(row) + "\n" for row in rows)
+    if fmt == "columnar":
+        # One record batch per chunk: {"rows": n, "columns": {name: [values...]}}.
+        return json.dumps({"rows": len(rows), "columns": {c: [row[c] for row in rows] for c in columns}}) + "\n"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[c] for c in columns])
+    return buffer.getvalue()
+
+
+def _csv_line(values: List[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import math
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import networkx as nx
+
+from .data import TAMIL_NADU_BOUNDS
+from .routing import edge_key
+from .synth import Driver, Warehouse
+from .telemetry import DriverTelemetry
+
+# Entities are located by their slippy-map tile at INDEX_ZOOM, stored as a Morton
+# (quadkey) code. Every coarser tile is a contiguous code range, so the sorted
+# code list doubles as a precomputed quadtree.
+INDEX_ZOOM = 18
+# At or below this zoom tiles return clusters; above it, raw features.
+CLUSTER_MAX_ZOOM = 10
+# Clusters are cells CLUSTER_DEPTH zoom levels below the tile (4x4 per tile at 2).
+CLUSTER_DEPTH = 2
+MAX_TILES_PER_REQUEST = 64
+TILE_CACHE_SIZE = 4096
+
+BBox = Tuple[float, float, float, float]  # (min_lon, min_lat, max_lon, max_lat)
+
+
+class ViewportTooLarge(ValueError):
+    pass
+
+
+def tile_xy(lat: float, lon: float, zoom: int) -> Tuple[int, int]:
+    """Web-Mercator (slippy map) tile containing a point."""
+    n = 1 << zoom
+    lat_rad = math.radians(max(min(lat, 85.0511), -85.0511))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def morton(x: int, y: int) -> int:
+    code = 0
+    for bit in range(INDEX_ZOOM):
+        code |= ((x >> bit) & 1) << (2 * bit) | ((y >> bit) & 1) << (2 * bit + 1)
+    return code
+
+
+def unmorton(code: int) -> Tuple[int, int]:
+    x = y = 0
+    for bit in range(INDEX_ZOOM):
+        x |= ((code >> (2 * bit)) & 1) << bit
+        y |= ((code >> (2 * bit + 1)) & 1) << bit
+    return x, y
+
+
+def tile_center(x: int, y: int, zoom: int) -> Tuple[float, float]:
+    """(lat, lon) at the centre of a tile."""
+    n = 1 << zoom
+    lon = (x + 0.5) / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 0.5) / n))))
+    return lat, lon
+
+
+def clamp_bbox(bbox: Optional[BBox]) -> BBox:
+    b = TAMIL_NADU_BOUNDS
+    if bbox is None:
+        return b["min_lon"], b["min_lat"], b["max_lon"], b["max_lat"]
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return (
+        max(min(min_lon, max_lon), b["min_lon"]),
+        max(min(min_lat, max_lat), b["min_lat"]),
+        min(max(min_lon, max_lon), b["max_lon"]),
+        min(max(min_lat, max_lat), b["max_lat"]),
+    )
+
+
+def _point(lat: float, lon: float, properties: Dict) -> Dict:
+    return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]}, "properties": properties}
+
+
+class GeoIndex:
+    """Quadtree index over warehouses, drivers and graph edges with a per-tile feature cache.
+
+    Tiles cache the static layer: hubs, links and their clusters. Drivers are
+    overlaid per request from a small index that places each driver at its
+    latest telemetry position (its home warehouse until the first ping) and is
+    rebuilt only when the telemetry changes. Call `invalidate()` when
+    warehouse/link status changes so cached tiles pick it up. Safe to use from
+    threadpool threads.
+    """
+
+    def __init__(
+        self,
+        warehouses: Sequence[Warehouse],
+        drivers: Sequence[Driver],
+        graph: nx.Graph,
+        telemetry: Optional[DriverTelemetry] = None,
+    ):
+        self.graph = graph
+        self._warehouses = {wh.id: wh for wh in warehouses}
+        self._codes_by_wh = {wh.id: morton(*tile_xy(wh.lat, wh.lon, INDEX_ZOOM)) for wh in warehouses}
+
+        # (code, warehouse) sorted by code.
+        self._points = sorted(((self._codes_by_wh[wh.id], wh) for wh in warehouses), key=lambda p: p[0])
+        self._point_codes = [p[0] for p in self._points]
+
+        # Each edge is indexed under both endpoints.
+        ends = []
+        for a, b in graph.edges():
+            key = edge_key(a, b)
+            for node in key:
+                ends.append((self._codes_by_wh[node], key))
+        ends.sort(key=lambda e: e[0])
+        self._edge_ends = ends
+        self._edge_codes = [e[0] for e in ends]
+
+        self._drivers = list(drivers)
+        self._telemetry = telemetry
+        # (code, driver, lat, lon) sorted by code, as of telemetry version `_drivers_version`.
+        self._driver_points: List[Tuple[int, Driver, float, float]] = []
+        self._driver_codes: List[int] = []
+        self._drivers_version: Optional[int] = None
+
+        self._lock = threading.Lock()
+        self._tiles: "OrderedDict[Tuple[int, int, int], Dict]" = OrderedDict()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._tiles.clear()
+
+    def features(self, bbox: Optional[BBox], zoom: int) -> Dict:
+        """GeoJSON FeatureCollection for the viewport, assembled from cached tiles plus live drivers."""
+        min_lon, min_lat, max_lon, max_lat = clamp_bbox(bbox)
+        clustered = zoom <= CLUSTER_MAX_ZOOM
+        if min_lon > max_lon or min_lat > max_lat:
+            # Viewport entirely outside the covered area.
+            return {
+                "type": "FeatureCollection", "zoom": zoom, "clustered": clustered,
+                "bbox": None, "tiles": 0, "features": [],
+            }
+        x0, y0 = tile_xy(max_lat, min_lon, zoom)
+        x1, y1 = tile_xy(min_lat, max_lon, zoom)
+        count = (x1 - x0 + 1) * (y1 - y0 + 1)
+        if count > MAX_TILES_PER_REQUEST:
+            raise ViewportTooLarge(f"Viewport covers {count} tiles at zoom {zoom}; zoom in or shrink the bbox.")
+
+        driver_codes, driver_points = self._driver_index()
+        shift = 2 * (INDEX_ZOOM - zoom)
+        features: List[Dict] = []
+        seen_edges = set()
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                tile = self.tile(zoom, x, y)
+                low = morton(x, y) << shift
+                drivers = driver_points[bisect_left(driver_codes, low):bisect_left(driver_codes, low + (1 << shift))]
+                if clustered:
+                    features.extend(_cluster_features(tile, drivers, _cell_shift(shift)))
+                    continue
+                for feature in tile["features"]:
+                    props = feature["properties"]
+                    if props["kind"] == "edge":
+                        if props["id"] in seen_edges:
+                            continue
+                        seen_edges.add(props["id"])
+                        features.append(feature)
+                    else:
+                        lon, lat = feature["geometry"]["coordinates"]
+                        if min_lon <= lon <= max_lon and min_lat <= lat <= max_lat:
+                            features.append(feature)
+                for _, drv, lat, lon in drivers:
+                    if min_lon <= lon <= max_lon and min_lat <= lat <= max_lat:
+                        features.append(_point(lat, lon, {
+                            "kind": "driver", "id": drv.id, "name": drv.name,
+                            "vehicle_type": drv.vehicle_type, "warehouse_id": drv.warehouse_id,
+                        }))
+        return {
+            "type": "FeatureCollection",
+            "zoom": zoom,
+            "clustered": clustered,
+            "bbox": [min_lon, min_lat, max_lon, max_lat],
+            "tiles": count,
+            "features": features,
+        }
+
+    def tile(self, zoom: int, x: int, y: int) -> Dict:
+        """Static layer of one tile: raw `features`, or warehouse `cells` and `links` when clustered."""
+        key = (zoom, x, y)
+        with self._lock:
+            cached = self._tiles.get(key)
+            if cached is not None:
+                self._tiles.move_to_end(key)
+                return cached
+        shift = 2 * (INDEX_ZOOM - zoom)
+        low = morton(x, y) << shift
+        high = low + (1 << shift)
+        if zoom <= CLUSTER_MAX_ZOOM:
+            tile = self._cluster_tile(low, high, _cell_shift(shift))
+        else:
+            tile = {"features": self._raw_tile(low, high)}
+        with self._lock:
+            self._tiles[key] = tile
+            if len(self._tiles) > TILE_CACHE_SIZE:
+                self._tiles.popitem(last=False)
+        return tile
+
+    def _driver_index(self) -> Tuple[List[int], List[Tuple[int, Driver, float, float]]]:
+        version = self._telemetry.version if self._telemetry is not None else 0
+        with self._lock:
+            if version == self._drivers_version:
+                return self._driver_codes, self._driver_points
+        points = []
+        for drv in self._drivers:
+            latest = self._telemetry.latest(drv.id) if self._telemetry is not None else None
+            if latest is None:
+                home = self._warehouses[drv.warehouse_id]
+                lat, lon = home.lat, home.lon
+            else:
+                lat, lon = latest[0], latest[1]
+            points.append((morton(*tile_xy(lat, lon, INDEX_ZOOM)), drv, lat, lon))
+        points.sort(key=lambda p: p[0])
+        codes = [p[0] for p in points]
+        with self._lock:
+            self._driver_codes, self._driver_points, self._drivers_version = codes, points, version
+        return codes, points
+
+    def _raw_tile(self, low: int, high: int) -> List[Dict]:
+        wh_status = self.graph.graph.get("warehouse_status", {})
+        edge_status = self.graph.graph.get("edge_status", {})
+        features = []
+        for idx in range(bisect_left(self._point_codes, low), bisect_left(self._point_codes, high)):
+            _, wh = self._points[idx]
+            features.append(_point(wh.lat, wh.lon, {
+                "kind": "warehouse", "id": wh.id, "name": wh.name,
+                "district_code": wh.district_code, "status": wh_status.get(wh.id, "ok"),
+            }))
+        edges = {
+            self._edge_ends[idx][1]
+            for idx in range(bisect_left(self._edge_codes, low), bisect_left(self._edge_codes, high))
+        }
+        for a, b in sorted(edges):
+            wa, wb = self._warehouses[a], self._warehouses[b]
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": [[wa.lon, wa.lat], [wb.lon, wb.lat]]},
+                "properties": {
+                    "kind": "edge", "id": f"{a}--{b}", "a": a, "b": b,
+                    "distance_km": round(self.graph[a][b]["distance_km"], 2),
+                    "status": edge_status.get((a, b), "ok"),
+                },
+            })
+        return features
+
+    def _cluster_tile(self, low: int, high: int, cell_shift: int) -> Dict:
+        cells: Dict[int, Dict] = {}
+        for idx in range(bisect_left(self._point_codes, low), bisect_left(self._point_codes, high)):
+            code, wh = self._points[idx]
+            cell = cells.setdefault(code >> cell_shift, {"warehouses": 0, "lat_sum": 0.0, "lon_sum": 0.0})
+            cell["warehouses"] += 1
+            cell["lat_sum"] += wh.lat
+            cell["lon_sum"] += wh.lon
+
+        # Links between clusters, counted once from the cell of the edge's first endpoint.
+        links: Dict[Tuple[int, int], int] = {}
+        for idx in range(bisect_left(self._edge_codes, low), bisect_left(self._edge_codes, high)):
+            code, (a, b) = self._edge_ends[idx]
+            a_code, b_code = self._codes_by_wh[a], self._codes_by_wh[b]
+            if code != a_code:
+                continue
+            src, dst = a_code >> cell_shift, b_code >> cell_shift
+            if src != dst:
+                links[(src, dst)] = links.get((src, dst), 0) + 1
+
+        link_features = []
+        cell_zoom = INDEX_ZOOM - cell_shift // 2
+        for (src, dst), count in links.items():
+            (src_lat, src_lon), (dst_lat, dst_lon) = (tile_center(*unmorton(c), cell_zoom) for c in (src, dst))
+            link_features.append({
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": [[src_lon, src_lat], [dst_lon, dst_lat]]},
+                "properties": {"kind": "cluster_link", "from": f"c{src:x}", "to": f"c{dst:x}", "edges": count},
+            })
+        return {"cells": cells, "links": link_features}
+
+
+def _cell_shift(shift: int) -> int:
+    return max(shift - 2 * CLUSTER_DEPTH, 0)
+
+
+def _cluster_features(tile: Dict, drivers: List[Tuple[int, Driver, float, float]], cell_shift: int) -> List[Dict]:
+    """Cluster points for a cached tile's warehouse cells with the tile's drivers counted in.
+
+    A cluster sits at the mean of its warehouses, or of its drivers if it has none.
+    """
+    cells: Dict[int, Dict] = {
+        code: {**cell, "drivers": 0, "vehicle_types": {}, "drv_lat_sum": 0.0, "drv_lon_sum": 0.0}
+        for code, cell in tile["cells"].items()
+    }
+    for code, drv, lat, lon in drivers:
+        cell = cells.setdefault(code >> cell_shift, {
+            "warehouses": 0, "lat_sum": 0.0, "lon_sum": 0.0,
+            "drivers": 0, "vehicle_types": {}, "drv_lat_sum": 0.0, "drv_lon_sum": 0.0,
+        })
+        cell["drivers"] += 1
+        cell["vehicle_types"][drv.vehicle_type] = cell["vehicle_types"].get(drv.vehicle_type, 0) + 1
+        cell["drv_lat_sum"] += lat
+        cell["drv_lon_sum"] += lon
+
+    features = []
+    for cell_code, cell in cells.items():
+        if cell["warehouses"]:
+            lat, lon = cell["lat_sum"] / cell["warehouses"], cell["lon_sum"] / cell["warehouses"]
+        else:
+            lat, lon = cell["drv_lat_sum"] / cell["drivers"], cell["drv_lon_sum"] / cell["drivers"]
+        features.append(_point(lat, lon, {
+            "kind": "cluster", "id": f"c{cell_code:x}",
+            "warehouses": cell["warehouses"], "drivers": cell["drivers"],
+            "vehicle_types": cell["vehicle_types"],
+        }))
+    return features + tile["links"]
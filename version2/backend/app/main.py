@@ -2,19 +2,25 @@ from __future__ import annotations
 
 import asyncio
 import json
+import math
 import os
+import time
 import uuid
+import weakref
+from contextlib import AsyncExitStack
 from datetime import datetime, timedelta
-from typing import Dict, List, Set
+from typing import Callable, Dict, List, Set, Tuple
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Depends, status
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 
-from . import schemas, synth
+from . import metrics, schemas, synth, wire
 from .data import (
     DEFAULT_DRIVERS_PER_DISTRICT,
     DEFAULT_WAREHOUSES_PER_DISTRICT,
@@ -23,8 +29,23 @@ from .data import (
     OSM_TILE_URL,
     TAMIL_NADU_BOUNDS,
 )
-from .routing import RouteNotFound, build_graph, plan_route
-from .schemas import OrderOut, OrderRequest, QuoteRequest, RoutePlanOut, WarehouseOut
+from .eventlog import EventLog
+from .export import MEDIA_TYPES, ExportFormat, Granularity, stream_export
+from .geo import GeoIndex, ViewportTooLarge
+from .reroute import RouteIndex, plan_diff, remaining_path, reroute_orders
+from .rollups import RollupEngine, merge_delta
+from .routing import RouteNotFound, build_graph, edge_key, plan_route, set_edge_status, set_warehouse_status
+from .schemas import (
+    DriverPositionOut,
+    NetworkStatusUpdate,
+    OrderOut,
+    OrderRequest,
+    QuoteRequest,
+    RerouteResultOut,
+    RoutePlanOut,
+    WarehouseOut,
+)
+from .telemetry import BadPing, DriverTelemetry, EtaTracker, Ping, parse_ndjson, parse_ping
 
 # Load environment variables
 load_dotenv()
@@ -102,29 +123,251 @@ WAREHOUSES = synth.generate_warehouses(per_district=DEFAULT_WAREHOUSES_PER_DISTR
 DRIVERS = synth.generate_drivers(WAREHOUSES, per_district=DEFAULT_DRIVERS_PER_DISTRICT)
 GRAPH = build_graph(WAREHOUSES)
 ORDERS: Dict[str, OrderOut] = {}
+# Append-only creation order of ORDERS; lets exports page through orders by index.
+ORDER_IDS: List[str] = []
+ROUTE_INDEX = RouteIndex()
+TELEMETRY = DriverTelemetry([d.id for d in DRIVERS])
+ETA_TRACKER = EtaTracker()
+GEO_INDEX = GeoIndex(WAREHOUSES, DRIVERS, GRAPH, TELEMETRY)
+ROLLUPS = RollupEngine()
+# Durable, replayable order/custody history; off unless EVENT_LOG_DIR is set.
+EVENT_LOG = (
+    EventLog(
+        os.environ["EVENT_LOG_DIR"], fsync=os.getenv("EVENT_LOG_FSYNC", "1") != "0", index_key="order_id"
+    )
+    if os.getenv("EVENT_LOG_DIR") else None
+)
+
+
+def _index_order(order: OrderOut) -> None:
+    """Refresh the reroute index and the live-ETA segment for an order after its plan or progress changed."""
+    if order.status == "delivered":
+        ROUTE_INDEX.remove(order.id)
+        ETA_TRACKER.untrack(order.id)
+        return
+    ROUTE_INDEX.index(order.id, remaining_path(order))
+    if order.current_checkpoint < len(order.plan.segments):
+        ETA_TRACKER.track(order.id, order.current_checkpoint, order.plan.segments[order.current_checkpoint])
+
+
+# ---------- Event log: durability and replay --------------------------------
+def _snapshot_state() -> Callable[[], Dict]:
+    """Snapshot state. Only the order references are taken here; the event log's snapshot thread dumps them.
+
+    Network status is small and changes in place, so it is copied now.
+    """
+    orders = [ORDERS[order_id] for order_id in ORDER_IDS]
+    network = _network_changes()
+    return lambda: {"orders": [order.model_dump(mode="json", by_alias=True) for order in orders], "network": network}
+
+
+def _network_changes() -> List[Dict]:
+    """Every warehouse and link not `ok`, as `network_status_changed` event data."""
+    return [
+        {"warehouse_id": warehouse_id, "status": status}
+        for warehouse_id, status in GRAPH.graph.get("warehouse_status", {}).items()
+    ] + [
+        {"edge": [a, b], "status": status} for (a, b), status in GRAPH.graph.get("edge_status", {}).items()
+    ]
+
+
+def _set_network_status(data: Dict) -> None:
+    if "warehouse_id" in data:
+        set_warehouse_status(GRAPH, data["warehouse_id"], data["status"])
+    else:
+        set_edge_status(GRAPH, *data["edge"], data["status"])
+    GEO_INDEX.invalidate()
+
+
+def _load_order(data: Dict) -> OrderOut:
+    # PATCH /orders/{id}/status accepts the frontend's own status names, which the model's Literal does not list.
+    order = OrderOut.model_validate({**data, "status": "created"})
+    order.status = data["status"]
+    return order
+
+
+def _restore_order(order: OrderOut, ts: float) -> None:
+    ORDERS[order.id] = order
+    ORDER_IDS.append(order.id)
+    _index_order(order)
+    ROLLUPS.order_created(order, now=ts)
+
+
+def _replay_event(record: Dict) -> None:
+    """Apply one logged event to the in-memory state. Idempotent, so events a snapshot already covers are harmless."""
+    data, ts = record["data"], record["ts"]
+    if record["type"] == "network_status_changed":
+        _set_network_status(data)
+        return
+    if record["type"] == "order_created":
+        if data["order_id"] not in ORDERS:
+            _restore_order(_load_order(data["order"]), ts)
+        return
+    order = ORDERS.get(data["order_id"])
+    if order is None:
+        return
+    previous = order.status
+    if record["type"] == "order_rerouted":
+        old_plan = order.plan
+        order.plan = RoutePlanOut.model_validate(data["plan"])
+        ROLLUPS.plan_changed(order, old_plan)
+    elif record["type"] == "order_checkpoint_reached":
+        order.current_checkpoint = data["index"]
+    order.status = data.get("status", order.status)
+    ROLLUPS.status_changed(previous, order.status, now=ts)
+    _index_order(order)
+
+
+# First seq of every logged batch whose change is not applied to ORDERS yet; snapshots stop short of them.
+_UNAPPLIED: Set[int] = set()
+
+
+def _snapshot_seq() -> int:
+    """Last seq whose change, like every change before it, is already in ORDERS."""
+    return min(_UNAPPLIED) - 1 if _UNAPPLIED else EVENT_LOG.next_seq - 1
+
+
+async def record_events(events: List[tuple], apply: Callable[[], None]) -> None:
+    """Log `(type, data)` events durably, then `apply` the matching in-memory change.
+
+    The events are committed as one unit and nothing is applied unless they
+    are on disk, so a failed append leaves ORDERS untouched and answers 503;
+    the client can retry without duplicating anything.
+    """
+    if EVENT_LOG is None or not events:
+        apply()
+        return
+    first = EVENT_LOG.next_seq
+    try:
+        future = EVENT_LOG.submit_batch(events)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=f"Event log unavailable, change not applied: {exc}")
+    _UNAPPLIED.add(first)
+    try:
+        try:
+            await asyncio.wrap_future(future)
+        except Exception as exc:
+            raise HTTPException(status_code=503, detail=f"Event log unavailable, change not applied: {exc}")
+        apply()
+    finally:
+        _UNAPPLIED.discard(first)
+    if EVENT_LOG.snapshot_due():
+        EVENT_LOG.snapshot(_snapshot_state(), _snapshot_seq())
+
+
+# Held while an order's change is logged and applied, so changes to one order land in log order.
+# A network change takes several, always in sorted order.
+ORDER_LOCKS: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _order_lock(order_id: str) -> asyncio.Lock:
+    lock = ORDER_LOCKS.get(order_id)
+    if lock is None:
+        lock = ORDER_LOCKS[order_id] = asyncio.Lock()
+    return lock
+
+
+@app.on_event("startup")
+def restore_from_event_log() -> None:
+    """Rebuild orders and network status from the latest snapshot plus the events logged after it."""
+    if EVENT_LOG is None or EVENT_LOG.running:
+        return
+    state, tail = EVENT_LOG.recover()
+    for data in (state or {}).get("network", []):
+        _set_network_status(data)
+    for data in (state or {}).get("orders", []):
+        # Creation time is not in the snapshot: counted in the totals, not the sliding windows.
+        _restore_order(_load_order(data), ts=0.0)
+    for record in tail:
+        _replay_event(record)
+    EVENT_LOG.start()
+    if tail:
+        EVENT_LOG.snapshot(_snapshot_state())
+
+
+@app.on_event("shutdown")
+def close_event_log() -> None:
+    if EVENT_LOG is not None and EVENT_LOG.running:
+        EVENT_LOG.close(_snapshot_state(), _snapshot_seq())
 
 
 # ---------- WebSocket connections for real-time updates ---------------------
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Set[WebSocket] = set()
+        self.subscriptions: Dict[str, Set[WebSocket]] = {}
+        self.codecs: Dict[WebSocket, wire.Codec] = {}
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, codec: wire.Codec = wire.DEFAULT_CODEC):
         await websocket.accept()
         self.active_connections.add(websocket)
+        self.codecs[websocket] = codec
+        metrics.WS_CONNECTIONS_TOTAL.inc()
+        metrics.WS_CONNECTIONS.set(len(self.active_connections))
 
     def disconnect(self, websocket: WebSocket):
         self.active_connections.discard(websocket)
-
-    async def broadcast(self, message: dict):
+        self.codecs.pop(websocket, None)
+        for subscribers in self.subscriptions.values():
+            subscribers.discard(websocket)
+        metrics.WS_CONNECTIONS.set(len(self.active_connections))
+
+    async def send(
+        self, websocket: WebSocket, event_type: str, data: dict, ts: float | None = None, frames: Dict | None = None
+    ):
+        """Frame an event in the connection's codec and send it.
+
+        `frames` caches encoded frames per codec, so a fan-out encodes each
+        event once per codec rather than once per connection.
+        """
+        codec = self.codecs.get(websocket, wire.DEFAULT_CODEC)
+        frames = {} if frames is None else frames
+        cached = frames.get(codec)
+        if cached is None:
+            started = time.perf_counter()
+            frame = wire.encode(codec, event_type, data, time.time() if ts is None else ts)
+            metrics.WS_ENCODE_SECONDS.observe(time.perf_counter() - started, encoding=codec.encoding)
+            cached = frames[codec] = (frame, wire.frame_size(frame))
+        frame, size = cached
+        if isinstance(frame, str):
+            await websocket.send_text(frame)
+        else:
+            await websocket.send_bytes(frame)
+        metrics.WS_BYTES_SENT.inc(size, encoding=codec.encoding)
+
+    async def broadcast(self, event_type: str, data: dict):
         disconnected = set()
-        for connection in self.active_connections:
+        started = time.perf_counter()
+        frames: Dict = {}
+        ts = time.time()
+        for connection in list(self.active_connections):
             try:
-                await connection.send_json(message)
+                await self.send(connection, event_type, data, ts, frames)
             except Exception:
                 disconnected.add(connection)
         for conn in disconnected:
-            self.active_connections.discard(conn)
+            self.disconnect(conn)
+        metrics.WS_BROADCAST_SECONDS.observe(time.perf_counter() - started)
+        metrics.WS_BROADCASTS.inc(type=event_type)
+        metrics.WS_MESSAGES_SENT.inc(len(self.active_connections))
+        metrics.WS_SEND_FAILURES.inc(len(disconnected))
+        metrics.WS_CONNECTIONS.set(len(self.active_connections))
+
+    def subscribe(self, websocket: WebSocket, topic: str):
+        self.subscriptions.setdefault(topic, set()).add(websocket)
+
+    async def publish(self, topics: tuple, event_type: str, data: dict):
+        """Send to connections subscribed to any of `topics` (each connection at most once)."""
+        targets: Set[WebSocket] = set()
+        for topic in topics:
+            targets |= self.subscriptions.get(topic, set())
+        frames: Dict = {}
+        ts = time.time()
+        for connection in targets:
+            try:
+                await self.send(connection, event_type, data, ts, frames)
+            except Exception:
+                self.disconnect(connection)
 
 
 manager = ConnectionManager()
@@ -132,11 +375,13 @@ manager = ConnectionManager()
 
 async def broadcast_update(event_type: str, data: dict):
     """Broadcast an update to all connected clients."""
-    await manager.broadcast({
-        "type": event_type,
-        "data": data,
-        "timestamp": datetime.utcnow().isoformat()
-    })
+    await manager.broadcast(event_type, data)
+
+
+async def publish_stats_delta(delta: dict):
+    """Push a rollup delta to dashboards subscribed to the `stats` topic."""
+    if delta:
+        await manager.publish(("stats",), "stats_delta", delta)
 
 
 # ---------- AUTH ENDPOINTS ---------------------------------------------------
@@ -194,6 +439,27 @@ def list_drivers():
     return [d.__dict__ for d in DRIVERS]
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Routing stage timings, routing counters and WebSocket stats in Prometheus text format."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/profiles")
+def slowest_profiles():
+    """Folded-stack samples of the slowest profiled requests (PROFILE_SLOWEST_REQUESTS=N to enable)."""
+    return {"enabled": metrics.PROFILER.enabled, "profiles": metrics.PROFILER.slowest()}
+
+
+@app.get("/stats")
+async def dashboard_stats():
+    """Rollups for the admin stat cards: totals by status, district and vehicle plus 5m/1h/24h windows.
+
+    O(1) and on the event loop, like every writer of ROLLUPS.
+    """
+    return ROLLUPS.snapshot()
+
+
 @app.get("/map/config")
 def map_config():
     return {
@@ -204,9 +470,35 @@ def map_config():
     }
 
 
+@app.get("/map/features")
+def map_features(
+    bbox: str | None = Query(None, description="min_lon,min_lat,max_lon,max_lat (Leaflet toBBoxString order)"),
+    zoom: int = Query(7, ge=0, le=18),
+):
+    """Zoom-aware map payload: clusters at low zoom, raw hubs/drivers/links inside the viewport at high zoom."""
+    box = None
+    if bbox:
+        try:
+            box = tuple(float(v) for v in bbox.split(","))
+        except ValueError:
+            box = ()
+        if len(box) != 4 or not all(math.isfinite(v) for v in box):
+            raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    try:
+        return GEO_INDEX.features(box, zoom)
+    except ViewportTooLarge as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
 # ---------- QUOTE & ORDER ENDPOINTS ------------------------------------------
 @app.post("/quote", response_model=RoutePlanOut)
-def quote(payload: QuoteRequest):
+def quote(payload: QuoteRequest, alternatives: int = Query(1, ge=1, le=10)):
+    """Plan a route; `alternatives=k` adds up to k-1 diverse near-optimal plans."""
+    with metrics.PROFILER.profile("POST /quote"):
+        return _quote(payload, alternatives)
+
+
+def _quote(payload: QuoteRequest, alternatives: int) -> RoutePlanOut:
     try:
         plan = plan_route(
             graph=GRAPH,
@@ -218,30 +510,68 @@ def quote(payload: QuoteRequest):
             max_hops=payload.max_hops,
             seed=payload.seed or 2025,
             preferred_vehicle=payload.preferred_vehicle,
+            alternatives=alternatives,
         )
     except RouteNotFound as exc:
         raise HTTPException(status_code=404, detail=str(exc))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
-    return plan
+    with metrics.ROUTE_STAGE_SECONDS.time(stage="response_validation"):
+        return RoutePlanOut.model_validate(plan)
 
 
 @app.post("/orders", response_model=OrderOut)
 async def create_order(payload: OrderRequest):
-    plan = quote(QuoteRequest(**payload.dict()))
+    with metrics.PROFILER.profile("POST /orders"):
+        plan = _quote(QuoteRequest(**payload.dict()), alternatives=1)
     order_id = str(uuid.uuid4())
     order = OrderOut(id=order_id, request=payload, plan=plan)
-    ORDERS[order_id] = order
+
+    def apply() -> None:
+        ORDERS[order_id] = order
+        ORDER_IDS.append(order_id)
+        _index_order(order)
+
+    await record_events(
+        [("order_created", {"order_id": order_id, "order": order.model_dump(mode="json", by_alias=True)})], apply
+    )
     await broadcast_update("order_created", {
         "order_id": order_id,
         "origin": payload.origin_district,
         "destination": payload.destination_district,
-        "total_cost": plan["total_cost_inr"],
-        "segments": len(plan["segments"])
+        "total_cost": plan.total_cost_inr,
+        "segments": len(plan.segments)
     })
+    await publish_stats_delta(ROLLUPS.order_created(order))
     return order
 
 
+@app.get("/orders/export")
+def export_orders(
+    format: ExportFormat = "ndjson",
+    granularity: Granularity = "order",
+    status: str | None = None,
+    origin_district: str | None = None,
+    destination_district: str | None = None,
+    priority: str | None = None,
+    vehicle_type: str | None = None,
+):
+    """Stream orders (or their segments) as NDJSON, CSV or columnar record batches for analytics."""
+    filters = {
+        "status": status,
+        "origin_district": origin_district,
+        "destination_district": destination_district,
+        "priority": priority,
+        "vehicle_type": vehicle_type,
+    }
+    extension = "csv" if format == "csv" else "ndjson"
+    return StreamingResponse(
+        stream_export(ORDERS, ORDER_IDS, format, granularity, filters),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="orders-{granularity}.{extension}"'},
+    )
+
+
 @app.get("/orders/{order_id}", response_model=OrderOut)
 def get_order(order_id: str):
     if order_id not in ORDERS:
@@ -249,6 +579,16 @@ def get_order(order_id: str):
     return ORDERS[order_id]
 
 
+@app.get("/orders/{order_id}/events")
+def order_events(order_id: str):
+    """Audit trail of an order's logged events (creation, status, custody handoffs, reroutes), oldest first."""
+    if order_id not in ORDERS:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if EVENT_LOG is None:
+        raise HTTPException(status_code=503, detail="Event log is disabled; set EVENT_LOG_DIR")
+    return EVENT_LOG.read_indexed(order_id)
+
+
 @app.get("/orders")
 def list_orders():
     return list(ORDERS.values())
@@ -260,40 +600,261 @@ async def update_order_status(order_id: str, status: str):
     if order_id not in ORDERS:
         raise HTTPException(status_code=404, detail="Order not found")
     order = ORDERS[order_id]
-    order.status = status
+    async with _order_lock(order_id):
+        previous = order.status
+
+        def apply() -> None:
+            order.status = status
+            _index_order(order)
+
+        await record_events([("order_status_changed", {"order_id": order_id, "status": status})], apply)
     await broadcast_update("order_status_changed", {
         "order_id": order_id,
         "status": status
     })
+    await publish_stats_delta(ROLLUPS.status_changed(previous, status))
     return {"message": "Status updated", "order_id": order_id, "status": status}
 
 
+@app.post("/orders/{order_id}/checkpoint", response_model=OrderOut)
+async def advance_checkpoint(order_id: str):
+    """Record that the parcel reached its next checkpoint."""
+    if order_id not in ORDERS:
+        raise HTTPException(status_code=404, detail="Order not found")
+    order = ORDERS[order_id]
+    async with _order_lock(order_id):
+        last = len(order.plan.checkpoints) - 1
+        if order.current_checkpoint >= last:
+            raise HTTPException(status_code=409, detail="Order already at final checkpoint")
+        previous = order.status
+        index = order.current_checkpoint + 1
+        status = "delivered" if index == last else "in_progress"
+        checkpoint = order.plan.checkpoints[index]
+
+        def apply() -> None:
+            order.current_checkpoint = index
+            order.status = status
+            _index_order(order)
+
+        segments = order.plan.segments
+        # Custody moves from the driver of the segment just finished to the driver of the next one.
+        await record_events([("order_checkpoint_reached", {
+            "order_id": order_id,
+            "index": index,
+            "status": status,
+            "checkpoint": checkpoint,
+            "from_driver": segments[index - 1].driver.id,
+            "to_driver": segments[index].driver.id if index < len(segments) else None,
+        })], apply)
+    await broadcast_update("order_checkpoint_reached", {
+        "order_id": order_id,
+        "checkpoint": checkpoint,
+        "index": index,
+        "status": status,
+    })
+    await publish_stats_delta(ROLLUPS.status_changed(previous, status))
+    return order
+
+
+# ---------- NETWORK FAILURE ENDPOINTS ----------------------------------------
+@app.get("/network/status")
+def network_status():
+    return {
+        "warehouses": GRAPH.graph.get("warehouse_status", {}),
+        "edges": [
+            {"a": a, "b": b, "status": st} for (a, b), st in GRAPH.graph.get("edge_status", {}).items()
+        ],
+    }
+
+
+@app.put("/network/warehouses/{warehouse_id}/status", response_model=RerouteResultOut)
+async def update_warehouse_status(warehouse_id: str, payload: NetworkStatusUpdate):
+    """Degrade/close a hub and re-plan only the in-flight orders routed through it."""
+    if not GRAPH.has_node(warehouse_id):
+        raise HTTPException(status_code=404, detail="Warehouse not found")
+    change = {"warehouse_id": warehouse_id, "status": payload.status, "reason": payload.reason}
+    await record_events([("network_status_changed", change)], lambda: _set_network_status(change))
+    affected = ROUTE_INDEX.orders_for_warehouse(warehouse_id) if payload.status != "ok" else set()
+    return await _apply_network_change(warehouse_id, payload, affected)
+
+
+@app.put("/network/edges/{a}/{b}/status", response_model=RerouteResultOut)
+async def update_edge_status(a: str, b: str, payload: NetworkStatusUpdate):
+    """Degrade/close a link and re-plan only the in-flight orders that still cross it."""
+    if a == b or not GRAPH.has_node(a) or not GRAPH.has_node(b):
+        raise HTTPException(status_code=404, detail="Link not found")
+    change = {"edge": list(edge_key(a, b)), "status": payload.status, "reason": payload.reason}
+    await record_events([("network_status_changed", change)], lambda: _set_network_status(change))
+    affected = ROUTE_INDEX.orders_for_edge(a, b) if payload.status != "ok" else set()
+    return await _apply_network_change("--".join(edge_key(a, b)), payload, affected)
+
+
+# One reroute batch at a time, so two network changes never re-plan the same order concurrently.
+REROUTE_LOCK = asyncio.Lock()
+
+
+def _progress(order: OrderOut) -> Tuple[int, str]:
+    return order.current_checkpoint, order.status
+
+
+async def _apply_network_change(target: str, payload: NetworkStatusUpdate, affected: Set[str]) -> Dict:
+    async with REROUTE_LOCK:
+        return await _apply_reroutes(target, payload, affected)
+
+
+async def _apply_reroutes(target: str, payload: NetworkStatusUpdate, affected: Set[str]) -> Dict:
+    started = time.perf_counter()
+    rerouted: List[str] = []
+    failed: List[str] = []
+    diffs = []
+    stats_delta: Dict = {}
+    order_ids = sorted(affected)
+    try:
+        while order_ids:
+            # Plan in a worker thread so the event loop keeps serving; orders that reached a
+            # checkpoint meanwhile are planned again from their new position, not given a stale plan.
+            progress = {order_id: _progress(ORDERS[order_id]) for order_id in order_ids if order_id in ORDERS}
+            plans, lost = await run_in_threadpool(reroute_orders, order_ids, ORDERS, GRAPH, WAREHOUSES, DRIVERS)
+            failed.extend(lost)
+            async with AsyncExitStack() as locks:
+                for order_id in sorted(plans):
+                    await locks.enter_async_context(_order_lock(order_id))
+                order_ids = [order_id for order_id in plans if _progress(ORDERS[order_id]) != progress[order_id]]
+                fresh = {order_id: plan for order_id, plan in plans.items() if order_id not in order_ids}
+
+                def apply() -> None:
+                    for order_id, plan in fresh.items():
+                        order = ORDERS[order_id]
+                        previous = order.plan
+                        diffs.append(plan_diff(order_id, previous, plan, order.current_checkpoint))
+                        order.plan = plan
+                        _index_order(order)
+                        merge_delta(stats_delta, ROLLUPS.plan_changed(order, previous))
+                    rerouted.extend(fresh)
+
+                await record_events([
+                    ("order_rerouted", {"order_id": order_id, "plan": plan.model_dump(mode="json", by_alias=True)})
+                    for order_id, plan in fresh.items()
+                ], apply)
+    finally:
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        # Rounds applied before a failed append are live, so they are pushed even when the request answers 503.
+        await broadcast_update("network_status_changed", {
+            "target": target,
+            "status": payload.status,
+            "reason": payload.reason,
+            "affected_orders": len(affected),
+        })
+        for diff in diffs:
+            await broadcast_update("order_rerouted", diff)
+        for order_id in failed:
+            await broadcast_update("order_reroute_failed", {"order_id": order_id, "target": target})
+        await publish_stats_delta(stats_delta)
+
+    return {
+        "target": target,
+        "status": payload.status,
+        "affected_orders": len(affected),
+        "rerouted": rerouted,
+        "failed": failed,
+        "elapsed_ms": elapsed_ms,
+    }
+
+
+# ---------- DRIVER TELEMETRY ------------------------------------------------
+async def _ingest_pings(pings: List[Ping]) -> Dict[str, int]:
+    """Store pings, recompute ETAs for the drivers that moved and push the throttled updates."""
+    accepted, moved = TELEMETRY.ingest(pings)
+    updates = ETA_TRACKER.refresh(moved, TELEMETRY)
+    for update in updates:
+        await manager.publish(("eta", f"order:{update['order_id']}"), "eta_updated", update)
+    return {"accepted": accepted, "rejected": len(pings) - accepted, "eta_updates": len(updates)}
+
+
+@app.post("/telemetry")
+async def ingest_telemetry(request: Request):
+    """Batched driver positions as NDJSON, one `{"driver_id", "lat", "lon", "ts"}` object per line."""
+    pings, malformed = parse_ndjson(await request.body(), time.time())
+    result = await _ingest_pings(pings)
+    result["rejected"] += malformed
+    return result
+
+
+@app.get("/drivers/{driver_id}/position", response_model=DriverPositionOut)
+async def driver_position(driver_id: str, history: bool = False):
+    # Async on purpose: the telemetry buffers and ETA tracker are only touched from the event loop.
+    if driver_id not in TELEMETRY:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    latest = TELEMETRY.latest(driver_id)
+    return {
+        "driver_id": driver_id,
+        "latest": dict(zip(("lat", "lon", "ts"), latest)) if latest else None,
+        "history": [dict(zip(("lat", "lon", "ts"), p)) for p in TELEMETRY.track(driver_id)] if history else [],
+        "active_orders": sorted(ETA_TRACKER.by_driver.get(driver_id, {})),
+    }
+
+
+@app.websocket("/ws/telemetry")
+async def telemetry_websocket(websocket: WebSocket):
+    """Driver apps send `{"pings": [[driver_id, lat, lon, ts], ...]}` batches, text or binary; each is acked."""
+    await websocket.accept()
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            try:
+                batch = json.loads(frame["text"] if frame.get("text") is not None else frame["bytes"]).get("pings", [])
+                if not isinstance(batch, list):
+                    raise ValueError("pings must be a list")
+            except (ValueError, TypeError, AttributeError):
+                await websocket.send_json({"type": "error", "data": {"detail": "Expected {\"pings\": [...]}"}})
+                continue
+            now = time.time()
+            pings: List[Ping] = []
+            malformed = 0
+            for item in batch:
+                try:
+                    pings.append(parse_ping(item, now))
+                except BadPing:
+                    malformed += 1
+            result = await _ingest_pings(pings)
+            result["rejected"] += malformed
+            await websocket.send_json({"type": "ack", "data": result})
+    except WebSocketDisconnect:
+        pass
+
+
 # ---------- WEBSOCKET ENDPOINT -----------------------------------------------
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time updates."""
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, encoding: str = "json"):
+    """WebSocket endpoint for real-time updates.
+
+    `?encoding=msgpack` opts into the compact binary protocol (see `app.wire`);
+    the negotiated codec and event-code table come back in the `connected`
+    event. Compression is the transport's permessage-deflate extension.
+    """
+    codec = wire.negotiate(encoding)
+    await manager.connect(websocket, codec)
     try:
-        await websocket.send_json({
-            "type": "connected",
-            "data": {
-                "orders_count": len(ORDERS),
-                "drivers_count": len(DRIVERS),
-                "warehouses_count": len(WAREHOUSES)
-            },
-            "timestamp": datetime.utcnow().isoformat()
+        await manager.send(websocket, "connected", {
+            "orders_count": len(ORDERS),
+            "drivers_count": len(DRIVERS),
+            "warehouses_count": len(WAREHOUSES),
+            "protocol": codec.describe(),
         })
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            message = wire.decode(codec, frame["text"] if frame.get("text") is not None else frame["bytes"])
+            if not isinstance(message, dict):
+                continue
             if message.get("type") == "ping":
-                await websocket.send_json({"type": "pong", "timestamp": datetime.utcnow().isoformat()})
+                await manager.send(websocket, "pong", None)
             elif message.get("type") == "subscribe":
-                await websocket.send_json({
-                    "type": "subscribed",
-                    "data": {"topic": message.get("topic", "all")},
-                    "timestamp": datetime.utcnow().isoformat()
-                })
+                manager.subscribe(websocket, message.get("topic", "all"))
+                await manager.send(websocket, "subscribed", {"topic": message.get("topic", "all")})
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception:
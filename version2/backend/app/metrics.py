@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Lightweight in-process metrics rendered in the Prometheus text format, so the
+# service needs no extra dependency to expose `/metrics`.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in sorted(values)]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[idx] += 1
+                    break
+            else:
+                row[len(self.buckets)] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            row = self._values.get(_label_key(labels))
+            return int(sum(row[:-1])) if row else 0
+
+    def _samples(self) -> List[str]:
+        # Copy under the lock: sync endpoints observe from threadpool threads while this renders.
+        with self._lock:
+            rows = [(key, list(row)) for key, row in self._values.items()]
+        lines: List[str] = []
+        for key, row in sorted(rows):
+            cumulative = 0.0
+            for bound, hits in zip(self.buckets, row):
+                cumulative += hits
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(bound)))} {cumulative}")
+            cumulative += row[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {row[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Accumulates time per stage within one request, then records each total once.
+
+    Stages such as the shortest-path loop run many times per plan; summing them
+    first keeps the histogram a per-request breakdown.
+    """
+
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+
+    @contextmanager
+    def __call__(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[stage] = self.totals.get(stage, 0.0) + time.perf_counter() - started
+
+    def observe(self, histogram: Histogram) -> None:
+        for stage, seconds in self.totals.items():
+            histogram.observe(seconds, stage=stage)
+
+
+REGISTRY = Registry()
+
+ROUTE_STAGE_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "route_stage_seconds", "Time spent per plan_route stage, per request."
+))
+GRAPHS_BUILT: Counter = REGISTRY.register(Counter("route_graphs_built_total", "Routing graphs built."))
+PATHS_EVALUATED: Counter = REGISTRY.register(Counter(
+    "route_paths_evaluated_total", "Candidate shortest paths evaluated by plan_route."
+))
+NO_VEHICLE_SKIPS: Counter = REGISTRY.register(Counter(
+    "route_no_vehicle_skips_total", "Start/goal pairs skipped because NoVehicleAvailable was raised."
+))
+WS_CONNECTIONS: Gauge = REGISTRY.register(Gauge("ws_connections_active", "Open /ws connections."))
+WS_CONNECTIONS_TOTAL: Counter = REGISTRY.register(Counter("ws_connections_total", "Accepted /ws connections."))
+WS_BROADCASTS: Counter = REGISTRY.register(Counter("ws_broadcasts_total", "Broadcast events, by type."))
+WS_MESSAGES_SENT: Counter = REGISTRY.register(Counter("ws_messages_sent_total", "Messages delivered to /ws clients."))
+WS_SEND_FAILURES: Counter = REGISTRY.register(Counter(
+    "ws_send_failures_total", "Broadcast sends that failed and dropped the connection."
+))
+WS_BYTES_SENT: Counter = REGISTRY.register(Counter(
+    "ws_bytes_sent_total", "Payload bytes delivered to /ws clients, by negotiated encoding."
+))
+WS_ENCODE_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "ws_encode_seconds", "Time to frame one event for one negotiated codec.",
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01),
+))
+WS_BROADCAST_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "ws_broadcast_seconds", "Time to fan one event out to every /ws client."
+))
+
+EVENT_LOG_APPENDS: Counter = REGISTRY.register(Counter("event_log_appends_total", "Records made durable in the event log."))
+EVENT_LOG_BATCH_SIZE: Histogram = REGISTRY.register(Histogram(
+    "event_log_batch_size", "Records per group commit (write + fsync).",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096),
+))
+EVENT_LOG_FSYNC_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "event_log_fsync_seconds", "Time spent in fsync per group commit."
+))
+
+# ---------- Opt-in sampling profiler -----------------------------------------
+class SlowRequestProfiler:
+    """Samples the stack of the calling thread while a request runs and keeps the slowest N.
+
+    Samples are stored as folded stacks ("frame;frame;frame" -> count), the input
+    format of flamegraph.pl and speedscope. Disabled (zero overhead beyond a check)
+    when `keep` is 0.
+    """
+
+    def __init__(self, keep: int, interval: float = 0.002):
+        self.keep = keep
+        self.interval = interval
+        self._slowest: List[Tuple[float, int, Dict]] = []  # min-heap on duration
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.keep > 0
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        target = threading.get_ident()
+        stacks: _Tally = _Tally()
+        stop = threading.Event()
+
+        def sample() -> None:
+            while not stop.wait(self.interval):
+                frame = sys._current_frames().get(target)
+                if frame is not None:
+                    stacks[_fold(frame)] += 1
+
+        sampler = threading.Thread(target=sample, name="slow-request-profiler", daemon=True)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.join()
+            self._record(name, time.perf_counter() - started, stacks)
+
+    def _record(self, name: str, seconds: float, stacks: _Tally) -> None:
+        entry = {
+            "name": name,
+            "duration_ms": round(seconds * 1000, 2),
+            "samples": sum(stacks.values()),
+            "folded": [f"{stack} {count}" for stack, count in stacks.most_common()],
+        }
+        with self._lock:
+            item = (seconds, next(self._seq), entry)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, item)
+            elif seconds > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def slowest(self) -> List[Dict]:
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._slowest, reverse=True)]
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+PROFILER = SlowRequestProfiler(keep=int(os.getenv("PROFILE_SLOWEST_REQUESTS", "0")))
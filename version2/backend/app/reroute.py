@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import networkx as nx
+
+from .routing import NoVehicleAvailable, RouteNotFound, edge_key, plan_route, seeded_graph
+from .schemas import OrderOut, RoutePlanOut
+from .synth import Driver, Warehouse
+
+
+def route_path(plan: RoutePlanOut) -> List[str]:
+    """Warehouse ids visited by a plan, in order."""
+    if not plan.segments:
+        return []
+    return [plan.segments[0].from_.id] + [seg.to.id for seg in plan.segments]
+
+
+def remaining_path(order: OrderOut) -> List[str]:
+    """Warehouse ids from the order's current checkpoint to its final hub."""
+    return route_path(order.plan)[order.current_checkpoint:]
+
+
+class RouteIndex:
+    """Reverse index from warehouses and links to orders whose remaining segments use them.
+
+    Only the part of a route still ahead of the parcel is indexed, so a failure
+    touches exactly the orders that would actually cross it.
+    """
+
+    def __init__(self):
+        self.by_warehouse: Dict[str, Set[str]] = {}
+        self.by_edge: Dict[Tuple[str, str], Set[str]] = {}
+        self._paths: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def index(self, order_id: str, path: List[str]) -> None:
+        self.remove(order_id)
+        if len(path) < 2:
+            return
+        self._paths[order_id] = path
+        # The current checkpoint (path[0]) is already reached; only hubs ahead count.
+        for wh_id in path[1:]:
+            self.by_warehouse.setdefault(wh_id, set()).add(order_id)
+        for a, b in zip(path, path[1:]):
+            self.by_edge.setdefault(edge_key(a, b), set()).add(order_id)
+
+    def remove(self, order_id: str) -> None:
+        path = self._paths.pop(order_id, None)
+        if not path:
+            return
+        for wh_id in path[1:]:
+            _discard(self.by_warehouse, wh_id, order_id)
+        for a, b in zip(path, path[1:]):
+            _discard(self.by_edge, edge_key(a, b), order_id)
+
+    def orders_for_warehouse(self, warehouse_id: str) -> Set[str]:
+        return set(self.by_warehouse.get(warehouse_id, ()))
+
+    def orders_for_edge(self, a: str, b: str) -> Set[str]:
+        return set(self.by_edge.get(edge_key(a, b), ()))
+
+
+def _discard(index: Dict, key, order_id: str) -> None:
+    bucket = index.get(key)
+    if bucket is None:
+        return
+    bucket.discard(order_id)
+    if not bucket:
+        del index[key]
+
+
+def merge_plan(order: OrderOut, replanned: Dict) -> RoutePlanOut:
+    """Splice a plan from the current checkpoint onto the segments already travelled."""
+    done = order.current_checkpoint
+    segments = [seg.model_dump(by_alias=True) for seg in order.plan.segments[:done]] + replanned["segments"]
+    return RoutePlanOut(
+        priority=order.plan.priority,
+        fuel_index=replanned["fuel_index"],
+        total_cost_inr=round(sum(s["cost_inr"] for s in segments), 1),
+        total_eta_minutes=round(sum(s["eta_minutes"] for s in segments), 1),
+        total_distance_km=round(sum(s["distance_km"] for s in segments), 1),
+        checkpoints=order.plan.checkpoints[:done] + replanned["checkpoints"],
+        segments=segments,
+    )
+
+
+def plan_diff(order_id: str, before: RoutePlanOut, after: RoutePlanOut, done: int) -> Dict:
+    return {
+        "order_id": order_id,
+        "from_checkpoint": after.checkpoints[done],
+        "removed": before.checkpoints[done + 1:],
+        "added": after.checkpoints[done + 1:],
+        "cost_delta_inr": round(after.total_cost_inr - before.total_cost_inr, 1),
+        "eta_delta_minutes": round(after.total_eta_minutes - before.total_eta_minutes, 1),
+    }
+
+
+def reroute_orders(
+    order_ids: Iterable[str],
+    orders: Dict[str, OrderOut],
+    graph: nx.Graph,
+    warehouses: List[Warehouse],
+    drivers: List[Driver],
+) -> Tuple[Dict[str, RoutePlanOut], List[str]]:
+    """Re-plan the given orders from their current checkpoint against the live graph.
+
+    Orders sharing the same checkpoint, destination and planning options reuse a
+    single `plan_route` call, and every call with the same seed shares one seeded
+    graph. Runs synchronously; call it from a worker thread. Returns (new plans by order id, ids that could not
+    be re-planned); `orders` is not mutated.
+    """
+    warehouses_by_id = {wh.id: wh for wh in warehouses}
+    cache: Dict[Tuple, Optional[Dict]] = {}
+    seed_graphs: Dict[int, nx.Graph] = {}
+    replanned: Dict[str, RoutePlanOut] = {}
+    failed: List[str] = []
+
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        if order is None or order.status == "delivered":
+            continue
+        path = remaining_path(order)
+        if len(path) < 2:
+            continue
+        current, final = path[0], path[-1]
+        request = order.request
+        hops_left = max(request.max_hops - order.current_checkpoint, 1)
+        key = (current, final, request.priority, request.preferred_vehicle, hops_left, request.seed)
+        if key not in cache:
+            seed = request.seed or 2025
+            if seed not in seed_graphs:
+                seed_graphs[seed] = seeded_graph(warehouses, seed)
+            cache[key] = _replan(
+                graph, warehouses, drivers, warehouses_by_id[current], warehouses_by_id[final],
+                request.destination_district, request.priority, hops_left, seed,
+                request.preferred_vehicle, seed_graphs[seed],
+            )
+        plan = cache[key]
+        if plan is None:
+            failed.append(order_id)
+            continue
+        replanned[order_id] = merge_plan(order, plan)
+    return replanned, failed
+
+
+def _replan(
+    graph: nx.Graph,
+    warehouses: List[Warehouse],
+    drivers: List[Driver],
+    current: Warehouse,
+    final: Warehouse,
+    destination_district: str,
+    priority: str,
+    max_hops: int,
+    seed: int,
+    preferred_vehicle: Optional[str],
+    seed_graph: nx.Graph,
+) -> Optional[Dict]:
+    # Keep the original delivery hub if it is still reachable, otherwise fall back
+    # to any open hub in the destination district.
+    for destination_warehouse in (final.id, None):
+        try:
+            return plan_route(
+                graph=graph,
+                warehouses=warehouses,
+                drivers=drivers,
+                priority=priority,
+                origin_district=current.district_code,
+                destination_district=destination_district,
+                max_hops=max_hops,
+                seed=seed,
+                preferred_vehicle=preferred_vehicle,
+                origin_warehouse=current.id,
+                destination_warehouse=destination_warehouse,
+                seed_graph=seed_graph,
+            )
+        except (RouteNotFound, NoVehicleAvailable):
+            continue
+    return None
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .schemas import OrderOut, RoutePlanOut
+
+WINDOW_FIELDS = ("orders_created", "cost_inr", "eta_minutes", "status_changes", "delivered")
+# name -> (span seconds, bucket count)
+WINDOWS: Dict[str, Tuple[int, int]] = {
+    "5m": (300, 60),
+    "1h": (3600, 60),
+    "24h": (86400, 96),
+}
+
+
+class RingWindow:
+    """Sliding-window sums over a fixed ring of time buckets.
+
+    Running totals are kept alongside the ring; a bucket leaving the window is
+    subtracted as it is recycled, so adding and reading are O(1) amortised.
+    Reads recycle buckets too, so both go through one lock.
+    """
+
+    def __init__(self, span_s: int, buckets: int):
+        self.width = span_s / buckets
+        self.size = buckets
+        self._slots = [[0.0] * len(WINDOW_FIELDS) for _ in range(buckets)]
+        self._epochs = [-1] * buckets
+        self._totals = [0.0] * len(WINDOW_FIELDS)
+        self._current = -1
+        self._lock = threading.Lock()
+
+    def _advance(self, now: float) -> int:
+        epoch = int(now // self.width)
+        if epoch > self._current:
+            # Recycle every bucket that fell out of the window (at most the whole ring).
+            for stale in range(max(self._current + 1, epoch - self.size + 1), epoch + 1):
+                idx = stale % self.size
+                if self._epochs[idx] != stale:
+                    slot = self._slots[idx]
+                    for f in range(len(slot)):
+                        self._totals[f] -= slot[f]
+                        slot[f] = 0.0
+                    self._epochs[idx] = stale
+            self._current = epoch
+        return epoch
+
+    def add(self, now: float, values: Dict[str, float]) -> None:
+        with self._lock:
+            epoch = self._advance(now)
+            if epoch < self._current - self.size + 1:
+                return  # older than the window
+            slot = self._slots[epoch % self.size]
+            for f, name in enumerate(WINDOW_FIELDS):
+                value = values.get(name)
+                if value:
+                    slot[f] += value
+                    self._totals[f] += value
+
+    def totals(self, now: float) -> Dict[str, float]:
+        with self._lock:
+            self._advance(now)
+            return {name: round(self._totals[f], 2) for f, name in enumerate(WINDOW_FIELDS)}
+
+
+def merge_delta(into: Dict, source: Dict) -> None:
+    """Add a nested delta ({section: {key: {field: value}}} or {section: {field: value}}) into another."""
+    for section, rows in source.items():
+        target = into.setdefault(section, {})
+        for key, value in rows.items():
+            if isinstance(value, dict):
+                row = target.setdefault(key, {})
+                for name, amount in value.items():
+                    row[name] = round(row.get(name, 0) + amount, 2)
+            else:
+                target[key] = round(target.get(key, 0) + value, 2)
+
+
+def _bump(table: Dict[str, Dict[str, float]], key: str, delta: Dict[str, float], out: Dict) -> None:
+    row = table.setdefault(key, {})
+    out_row = out.setdefault(key, {})
+    for name, value in delta.items():
+        row[name] = round(row.get(name, 0) + value, 2)
+        out_row[name] = round(out_row.get(name, 0) + value, 2)
+
+
+class RollupEngine:
+    """Dashboard totals maintained incrementally from order events.
+
+    Every mutator returns the delta it applied, which callers push to
+    dashboards; `snapshot` reads the maintained counters without scanning orders.
+    """
+
+    def __init__(self):
+        self.by_status: Dict[str, int] = {}
+        self.by_district: Dict[str, Dict[str, float]] = {}
+        self.by_vehicle: Dict[str, Dict[str, float]] = {}
+        self.totals: Dict[str, float] = {"orders": 0, "cost_inr": 0.0, "eta_minutes": 0.0, "distance_km": 0.0}
+        self.windows = {name: RingWindow(span, buckets) for name, (span, buckets) in WINDOWS.items()}
+
+    def order_created(self, order: OrderOut, now: Optional[float] = None) -> Dict:
+        now = time.time() if now is None else now
+        delta: Dict = {"status": {order.status: 1}, "district": {}, "totals": {"orders": 1}}
+        self.by_status[order.status] = self.by_status.get(order.status, 0) + 1
+        self.totals["orders"] += 1
+        _bump(self.by_district, order.request.origin_district, {"orders": 1}, delta["district"])
+        merge_delta(delta, self._apply_plan(order, order.plan, 1))
+        for window in self.windows.values():
+            window.add(now, {
+                "orders_created": 1,
+                "cost_inr": order.plan.total_cost_inr,
+                "eta_minutes": order.plan.total_eta_minutes,
+            })
+        return delta
+
+    def status_changed(self, old: str, new: str, now: Optional[float] = None) -> Dict:
+        if old == new:
+            return {}
+        now = time.time() if now is None else now
+        self.by_status[old] = self.by_status.get(old, 0) - 1
+        self.by_status[new] = self.by_status.get(new, 0) + 1
+        for window in self.windows.values():
+            window.add(now, {"status_changes": 1, "delivered": 1 if new == "delivered" else 0})
+        return {"status": {old: -1, new: 1}}
+
+    def plan_changed(self, order: OrderOut, old_plan: RoutePlanOut) -> Dict:
+        """Swap a rerouted order's old plan out of the cost/vehicle totals."""
+        delta: Dict = {}
+        merge_delta(delta, self._apply_plan(order, old_plan, -1))
+        merge_delta(delta, self._apply_plan(order, order.plan, 1))
+        return delta
+
+    def _apply_plan(self, order: OrderOut, plan: RoutePlanOut, sign: int) -> Dict:
+        delta: Dict = {"district": {}, "vehicle": {}}
+        cost, eta, km = sign * plan.total_cost_inr, sign * plan.total_eta_minutes, sign * plan.total_distance_km
+        self.totals["cost_inr"] = round(self.totals["cost_inr"] + cost, 2)
+        self.totals["eta_minutes"] = round(self.totals["eta_minutes"] + eta, 2)
+        self.totals["distance_km"] = round(self.totals["distance_km"] + km, 2)
+        _bump(self.by_district, order.request.origin_district, {"cost_inr": cost, "eta_minutes": eta}, delta["district"])
+        for seg in plan.segments:
+            _bump(self.by_vehicle, seg.vehicle_type, {
+                "segments": sign, "distance_km": sign * seg.distance_km, "cost_inr": sign * seg.cost_inr,
+            }, delta["vehicle"])
+        delta["totals"] = {"cost_inr": round(cost, 2), "eta_minutes": round(eta, 2), "distance_km": round(km, 2)}
+        return delta
+
+    def snapshot(self, now: Optional[float] = None) -> Dict:
+        now = time.time() if now is None else now
+        orders = self.totals["orders"]
+        return {
+            "totals": {
+                **self.totals,
+                "avg_cost_inr": round(self.totals["cost_inr"] / orders, 2) if orders else 0.0,
+                "avg_eta_minutes": round(self.totals["eta_minutes"] / orders, 2) if orders else 0.0,
+            },
+            "by_status": {k: v for k, v in self.by_status.items() if v},
+            "by_district": self.by_district,
+            "by_vehicle": self.by_vehicle,
+            "windows": {name: window.totals(now) for name, window in self.windows.items()},
+        }
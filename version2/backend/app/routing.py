@@ -1,16 +1,43 @@
 from __future__ import annotations
 
+import heapq
+import itertools
 import math
 import random
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Literal, Optional, Tuple
+from typing import Dict, List, Literal, Optional, Set, Tuple
 
 import networkx as nx
 
+from . import metrics
 from .data import DISTRICTS, VEHICLE_TYPES
 from .synth import Driver, Warehouse, compute_vehicle_availability, haversine_km
 
 Priority = Literal["cost", "time"]
+NetworkStatus = Literal["ok", "degraded", "closed"]
+
+# Score multiplier applied to hops that touch a degraded warehouse or link.
+DEGRADED_PENALTY = 1.5
+
+# Alternative routes: links already used by a route are made this much dearer
+# before searching for the next one; alternatives scoring above the stretch
+# factor times the best route are dropped; searches allowed per alternative.
+ALTERNATIVE_LINK_PENALTY = 1.6
+ALTERNATIVE_MAX_STRETCH = 1.5
+ALTERNATIVE_ATTEMPTS = 4
+
+# Seeded graphs depend only on (seed, warehouses), which are static, so they are
+# built once and kept in a small LRU shared by quotes and re-plans.
+SEEDED_GRAPH_CACHE_SIZE = 32
+_SEEDED_GRAPHS: "OrderedDict[Tuple[int, Tuple[str, ...]], nx.Graph]" = OrderedDict()
+_SEEDED_GRAPHS_LOCK = threading.Lock()
+
+
+# Memo marker for hops that raised NoVehicleAvailable.
+_NO_VEHICLE = object()
 
 
 class NoVehicleAvailable(Exception):
@@ -35,6 +62,7 @@ def fuel_price_index(now: Optional[datetime] = None, seed: Optional[int] = None)
 
 def build_graph(warehouses: List[Warehouse], k_nearest: int = 6, seed: Optional[int] = None) -> nx.Graph:
     """Sparse k-nearest graph to encourage multi-hop routes. Seed affects edge selection."""
+    metrics.GRAPHS_BUILT.inc()
     g = nx.Graph()
     rng = random.Random(seed) if seed else random.Random()
     for wh in warehouses:
@@ -58,6 +86,76 @@ def build_graph(warehouses: List[Warehouse], k_nearest: int = 6, seed: Optional[
     return g
 
 
+def seeded_graph(warehouses: List[Warehouse], seed: Optional[int]) -> nx.Graph:
+    """The `build_graph(warehouses, seed=seed)` graph, cached. Treat it as read-only.
+
+    Without a seed the graph is random per call and is not cached.
+    """
+    if not seed:
+        return build_graph(warehouses, k_nearest=6, seed=seed)
+    key = (seed, tuple(wh.id for wh in warehouses))
+    with _SEEDED_GRAPHS_LOCK:
+        cached = _SEEDED_GRAPHS.get(key)
+        if cached is not None:
+            _SEEDED_GRAPHS.move_to_end(key)
+            return cached
+    graph = build_graph(warehouses, k_nearest=6, seed=seed)
+    with _SEEDED_GRAPHS_LOCK:
+        _SEEDED_GRAPHS[key] = graph
+        if len(_SEEDED_GRAPHS) > SEEDED_GRAPH_CACHE_SIZE:
+            _SEEDED_GRAPHS.popitem(last=False)
+    return graph
+
+
+def edge_key(a: str, b: str) -> Tuple[str, str]:
+    """Order-independent key for an undirected warehouse-to-warehouse link."""
+    return (a, b) if a <= b else (b, a)
+
+
+def set_warehouse_status(graph: nx.Graph, warehouse_id: str, status: NetworkStatus) -> None:
+    """Mark a warehouse degraded/closed (or back to ok) on the live graph, in place."""
+    statuses = graph.graph.setdefault("warehouse_status", {})
+    if status == "ok":
+        statuses.pop(warehouse_id, None)
+    else:
+        statuses[warehouse_id] = status
+
+
+def set_edge_status(graph: nx.Graph, a: str, b: str, status: NetworkStatus) -> None:
+    """Mark a link degraded/closed (or back to ok) on the live graph, in place.
+
+    Link status is keyed by warehouse pair rather than stored on the edge itself,
+    because seed-specific graphs built by `plan_route` select different edges.
+    """
+    statuses = graph.graph.setdefault("edge_status", {})
+    if status == "ok":
+        statuses.pop(edge_key(a, b), None)
+    else:
+        statuses[edge_key(a, b)] = status
+
+
+def edge_penalty(graph: nx.Graph, u: str, v: str) -> Optional[float]:
+    """Score multiplier for the hop u -> v, or None when the hop is closed."""
+    warehouse_status = graph.graph.get("warehouse_status")
+    edge_status = graph.graph.get("edge_status")
+    if not warehouse_status and not edge_status:
+        return 1.0
+    statuses = (
+        warehouse_status.get(u, "ok") if warehouse_status else "ok",
+        warehouse_status.get(v, "ok") if warehouse_status else "ok",
+        edge_status.get(edge_key(u, v), "ok") if edge_status else "ok",
+    )
+    if "closed" in statuses:
+        return None
+    if "degraded" in statuses:
+        return DEGRADED_PENALTY
+    return 1.0
+
+
+def warehouse_open(graph: nx.Graph, warehouse_id: str) -> bool:
+    return graph.graph.get("warehouse_status", {}).get(warehouse_id, "ok") != "closed"
+
+
 def best_vehicle_for_edge(
     origin_district: str,
     distance_km: float,
@@ -110,9 +208,26 @@ def plan_route(
     max_hops: int = 7,
     seed: int = 2025,
     preferred_vehicle: Optional[str] = None,
+    origin_warehouse: Optional[str] = None,
+    destination_warehouse: Optional[str] = None,
+    alternatives: int = 1,
+    seed_graph: Optional[nx.Graph] = None,
 ) -> Dict:
-    """Plan a multi-hop route between districts using available vehicles and warehouses."""
-    if origin_district == destination_district:
+    """Plan a multi-hop route between districts using available vehicles and warehouses.
+
+    `origin_warehouse`/`destination_warehouse` pin the route to specific hubs, which is
+    how in-flight orders are re-planned from their current checkpoint. Warehouse and
+    link status recorded on `graph` (see `set_warehouse_status`/`set_edge_status`) is
+    honoured: closed hops are skipped and degraded hops are penalised.
+
+    With `alternatives` > 1 the returned plan carries up to `alternatives - 1` extra
+    diverse plans under "alternatives", searched over the same seed graph and
+    memoised edge weights as the primary plan.
+
+    `seed_graph` defaults to the cached `seeded_graph(warehouses, seed)`; batch
+    callers may fetch it once and pass it in.
+    """
+    if origin_district == destination_district and not (origin_warehouse or destination_warehouse):
         raise RouteNotFound("Origin and destination are the same district.")
 
     warehouses_by_district: Dict[str, List[Warehouse]] = {}
@@ -122,15 +237,33 @@ def plan_route(
     if origin_district not in warehouses_by_district or destination_district not in warehouses_by_district:
         raise RouteNotFound("Unknown origin/destination district")
 
+    timings = metrics.StageTimer()
+    planning_started = time.perf_counter()
     availability = compute_vehicle_availability(drivers)
     availability_counts = {k: v.counts for k, v in availability.items()}
     fuel_index = fuel_price_index(seed=seed)
 
-    # Build a seed-specific graph for route variation
-    seed_graph = build_graph(warehouses, k_nearest=6, seed=seed)
-
-    start_nodes = [wh.id for wh in warehouses_by_district[origin_district]]
-    goal_nodes = set(wh.id for wh in warehouses_by_district[destination_district])
+    # Seed-specific graph for route variation, cached per (seed, warehouses).
+    with timings("build_graph"):
+        if seed_graph is None:
+            seed_graph = seeded_graph(warehouses, seed)
+        # An O(1) view with its own attribute dict, so the shared cached graph is
+        # never touched; the live network status is shared by reference.
+        seed_graph = nx.graphviews.generic_graph_view(seed_graph)
+        seed_graph.graph = {key: graph.graph[key] for key in ("warehouse_status", "edge_status") if key in graph.graph}
+
+    if origin_warehouse:
+        start_nodes = [origin_warehouse]
+    else:
+        start_nodes = [wh.id for wh in warehouses_by_district[origin_district] if warehouse_open(graph, wh.id)]
+    if destination_warehouse:
+        goal_nodes = {destination_warehouse}
+    else:
+        goal_nodes = set(wh.id for wh in warehouses_by_district[destination_district])
+    goal_nodes = {n for n in goal_nodes if warehouse_open(graph, n)}
+    goal_nodes.discard(origin_warehouse)
+    if not start_nodes or not goal_nodes:
+        raise RouteNotFound("No open warehouses at origin/destination.")
 
     rng = random.Random(seed)
     
@@ -141,16 +274,35 @@ def plan_route(
     # Add randomness factor to weight calculation based on seed
     noise_factor = rng.uniform(0.9, 1.1)
 
-    def weight(u: str, v: str, edge_data: Dict) -> float:
+    # Directed hop weights are memoised: every shortest-path run (and every
+    # alternative) reuses them instead of re-running vehicle selection.
+    weights: Dict[Tuple[str, str], Optional[float]] = {}
+
+    def weight(u: str, v: str, edge_data: Dict) -> Optional[float]:
+        if (u, v) in weights:
+            cached = weights[(u, v)]
+            if cached is _NO_VEHICLE:
+                raise NoVehicleAvailable(f"No vehicles available for {u} -> {v}")
+            return cached
+        penalty = edge_penalty(seed_graph, u, v)
+        if penalty is None:
+            # Returning None hides the edge from networkx shortest paths.
+            weights[(u, v)] = None
+            return None
         origin_wh: Warehouse = seed_graph.nodes[u]["warehouse"]
         distance_km = edge_data["distance_km"]
         avail = availability_counts.get(origin_wh.district_code, {})
-        vehicle, cost, eta = best_vehicle_for_edge(
-            origin_wh.district_code, distance_km, avail, priority, fuel_index, preferred_vehicle
-        )
+        try:
+            vehicle, cost, eta = best_vehicle_for_edge(
+                origin_wh.district_code, distance_km, avail, priority, fuel_index, preferred_vehicle
+            )
+        except NoVehicleAvailable:
+            weights[(u, v)] = _NO_VEHICLE
+            raise
         base_score = cost if priority == "cost" else eta
         # Add seed-based variation to weights
-        return base_score * noise_factor
+        weights[(u, v)] = base_score * noise_factor * penalty
+        return weights[(u, v)]
 
     best_path: Optional[List[str]] = None
     best_score: float = float("inf")
@@ -162,8 +314,13 @@ def plan_route(
         rng.shuffle(shuffled_goals)
         for target in shuffled_goals:
             try:
-                candidate_path = nx.shortest_path(seed_graph, source=start, target=target, weight=weight)
-                score = path_cost(seed_graph, candidate_path, priority, availability_counts, fuel_index, preferred_vehicle)
+                metrics.PATHS_EVALUATED.inc()
+                with timings("shortest_path"):
+                    candidate_path = nx.shortest_path(seed_graph, source=start, target=target, weight=weight)
+                with timings("path_cost"):
+                    score = path_cost(
+                        seed_graph, candidate_path, priority, availability_counts, fuel_index, preferred_vehicle
+                    )
                 if len(candidate_path) - 1 <= max_hops and score < best_score:
                     best_path = candidate_path
                     best_score = score
@@ -171,6 +328,7 @@ def plan_route(
                     if seed != 2025:
                         break
             except NoVehicleAvailable:
+                metrics.NO_VEHICLE_SKIPS.inc()
                 continue
             except nx.NetworkXNoPath:
                 continue
@@ -178,14 +336,46 @@ def plan_route(
             break
 
     if not best_path:
+        timings.totals["total"] = time.perf_counter() - planning_started
+        timings.observe(metrics.ROUTE_STAGE_SECONDS)
         raise RouteNotFound("No viable path found with current vehicles/hops.")
 
+    with timings("driver_selection"):
+        plan = _build_plan(
+            seed_graph, best_path, drivers, availability_counts, priority, fuel_index, preferred_vehicle, rng
+        )
+    if alternatives > 1:
+        with timings("alternatives"):
+            alternative_paths = _alternative_paths(
+                seed_graph, start_nodes, goal_nodes, best_path, alternatives - 1, max_hops, weight
+            )
+            plan["alternatives"] = [
+                _build_plan(
+                    seed_graph, path, drivers, availability_counts, priority, fuel_index, preferred_vehicle, rng
+                )
+                for path in alternative_paths
+            ]
+    timings.totals["total"] = time.perf_counter() - planning_started
+    timings.observe(metrics.ROUTE_STAGE_SECONDS)
+    return plan
+
+
+def _build_plan(
+    seed_graph: nx.Graph,
+    path: List[str],
+    drivers: List[Driver],
+    availability_counts: Dict[str, Dict[str, int]],
+    priority: Priority,
+    fuel_index: float,
+    preferred_vehicle: Optional[str],
+    rng: random.Random,
+) -> Dict:
     segments: List[Dict] = []
     total_cost = 0.0
     total_eta = 0.0
     total_distance = 0.0
-    for idx in range(len(best_path) - 1):
-        a, b = best_path[idx], best_path[idx + 1]
+    for idx in range(len(path) - 1):
+        a, b = path[idx], path[idx + 1]
         edge = seed_graph[a][b]
         distance_km = edge["distance_km"]
         origin_wh: Warehouse = seed_graph.nodes[a]["warehouse"]
@@ -217,10 +407,100 @@ def plan_route(
         "total_cost_inr": round(total_cost, 1),
         "total_eta_minutes": round(total_eta, 1),
         "total_distance_km": round(total_distance, 1),
-        "checkpoints": [seed_graph.nodes[n]["warehouse"].name for n in best_path],
+        "checkpoints": [seed_graph.nodes[n]["warehouse"].name for n in path],
     }
 
 
+def _alternative_paths(
+    seed_graph: nx.Graph,
+    start_nodes: List[str],
+    goal_nodes: Set[str],
+    primary: List[str],
+    count: int,
+    max_hops: int,
+    weight,
+) -> List[List[str]]:
+    """Up to `count` diverse hop-limited paths other than `primary` (penalty method).
+
+    Searches run directly on the seed graph with the primary plan's memoised hop
+    weights times a per-link penalty. After each accepted route its links are made
+    ALTERNATIVE_LINK_PENALTY times dearer and the search is re-run, so every
+    alternative costs one early-exit search that only prices hops near the route.
+    Routes scoring more than ALTERNATIVE_MAX_STRETCH times the primary route are
+    not near-optimal and dropped.
+    """
+    penalties: Dict[Tuple[str, str], float] = {}
+
+    def hop(u: str, v: str, edge_data: Dict) -> Optional[float]:
+        try:
+            w = weight(u, v, edge_data)
+        except NoVehicleAvailable:
+            return None
+        return None if w is None else w * penalties.get(edge_key(u, v), 1.0)
+
+    def score(path: List[str]) -> float:
+        return sum(weight(a, b, seed_graph[a][b]) for a, b in zip(path, path[1:]))
+
+    def penalise(path: List[str]) -> None:
+        for a, b in zip(path, path[1:]):
+            key = edge_key(a, b)
+            penalties[key] = penalties.get(key, 1.0) * ALTERNATIVE_LINK_PENALTY
+
+    limit = score(primary) * ALTERNATIVE_MAX_STRETCH
+    seen = [primary]
+    accepted: List[List[str]] = []
+    penalise(primary)
+    for _ in range(count * ALTERNATIVE_ATTEMPTS):
+        candidate = _nearest_goal_path(seed_graph, start_nodes, goal_nodes, hop)
+        if candidate is None:
+            break
+        penalise(candidate)
+        if candidate in seen:
+            continue
+        seen.append(candidate)
+        if len(candidate) - 1 > max_hops or score(candidate) > limit:
+            continue
+        accepted.append(candidate)
+        if len(accepted) == count:
+            break
+    return sorted(accepted, key=score)
+
+
+def _nearest_goal_path(graph: nx.Graph, sources: List[str], goals: Set[str], hop) -> Optional[List[str]]:
+    """Multi-source Dijkstra that stops at the first goal settled; `hop` returning None hides a hop.
+
+    Hops are priced only as they are relaxed, so nothing beyond the goal's
+    distance is weighed and no search graph has to be built.
+    """
+    best: Dict[str, float] = {node: 0.0 for node in sources}
+    pred: Dict[str, str] = {}
+    settled: Set[str] = set()
+    tiebreak = itertools.count()
+    heap = [(0.0, next(tiebreak), node) for node in sources]
+    heapq.heapify(heap)
+    while heap:
+        dist, _, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled.add(node)
+        if node in goals:
+            path = [node]
+            while path[-1] in pred:
+                path.append(pred[path[-1]])
+            return path[::-1]
+        for neighbour, edge_data in graph[node].items():
+            if neighbour in settled:
+                continue
+            w = hop(node, neighbour, edge_data)
+            if w is None:
+                continue
+            if dist + w < best.get(neighbour, float("inf")):
+                best[neighbour] = dist + w
+                pred[neighbour] = node
+                heapq.heappush(heap, (dist + w, next(tiebreak), neighbour))
+    return None
+
+
 def path_cost(
     graph: nx.Graph,
     path: List[str],
@@ -232,6 +512,9 @@ def path_cost(
     score = 0.0
     for idx in range(len(path) - 1):
         a, b = path[idx], path[idx + 1]
+        penalty = edge_penalty(graph, a, b)
+        if penalty is None:
+            return float("inf")
         edge = graph[a][b]
         distance = edge["distance_km"]
         origin_wh: Warehouse = graph.nodes[a]["warehouse"]
@@ -239,5 +522,5 @@ def path_cost(
         vehicle, cost, eta = best_vehicle_for_edge(
             origin_wh.district_code, distance, avail, priority, fuel_index, preferred_vehicle
         )
-        score += cost if priority == "cost" else eta
+        score += (cost if priority == "cost" else eta) * penalty
     return score
@@ -31,6 +31,7 @@ class Token(BaseModel):
 # ============================================================================
 
 Priority = Literal["cost", "time"]
+NetworkStatus = Literal["ok", "degraded", "closed"]
 
 
 class WarehouseOut(BaseModel):
@@ -49,6 +50,19 @@ class DriverOut(BaseModel):
     warehouse_id: str
 
 
+class PositionOut(BaseModel):
+    lat: float
+    lon: float
+    ts: float
+
+
+class DriverPositionOut(BaseModel):
+    driver_id: str
+    latest: Optional[PositionOut] = None
+    history: list[PositionOut] = []
+    active_orders: list[str] = []
+
+
 class RouteSegmentOut(BaseModel):
     from_: WarehouseOut = Field(..., alias="from")
     to: WarehouseOut
@@ -71,6 +85,7 @@ class RoutePlanOut(BaseModel):
     total_distance_km: float
     checkpoints: list[str]
     segments: list[RouteSegmentOut]
+    alternatives: list[RoutePlanOut] = []
 
 
 class QuoteRequest(BaseModel):
@@ -93,3 +108,19 @@ class OrderOut(BaseModel):
     status: Literal["created", "in_progress", "delivered"] = "created"
     request: OrderRequest
     plan: RoutePlanOut
+    # Index into `plan.checkpoints` of the last checkpoint the parcel reached.
+    current_checkpoint: int = 0
+
+
+class NetworkStatusUpdate(BaseModel):
+    status: NetworkStatus
+    reason: Optional[str] = None
+
+
+class RerouteResultOut(BaseModel):
+    target: str
+    status: NetworkStatus
+    affected_orders: int
+    rerouted: list[str]
+    failed: list[str]
+    elapsed_ms: float
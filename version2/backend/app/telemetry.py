@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import json
+import math
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .data import VEHICLE_TYPES
+from .schemas import RouteSegmentOut
+from .synth import haversine_km
+
+# Positions kept per driver; older pings are overwritten in place.
+TELEMETRY_HISTORY_SIZE = 120
+# ETA pushes per order are throttled to one per interval, and skipped when the
+# estimate moved by less than the minimum change.
+ETA_PUSH_INTERVAL_S = 2.0
+ETA_MIN_CHANGE_MIN = 0.5
+
+Ping = Tuple[str, float, float, float]
+
+
+class BadPing(ValueError):
+    pass
+
+
+def parse_ping(item, now: float) -> Ping:
+    """Accept `[driver_id, lat, lon, ts?]` or `{"driver_id", "lat", "lon", "ts"?}`; ts is epoch seconds."""
+    try:
+        if isinstance(item, dict):
+            ping = item["driver_id"], float(item["lat"]), float(item["lon"]), float(item.get("ts") or now)
+        else:
+            ts = float(item[3]) if len(item) > 3 and item[3] is not None else now
+            ping = item[0], float(item[1]), float(item[2]), ts
+    except (KeyError, IndexError, TypeError, ValueError) as exc:
+        raise BadPing(f"Malformed ping: {item!r}") from exc
+    if not isinstance(ping[0], str) or not all(math.isfinite(v) for v in ping[1:]):
+        raise BadPing(f"Malformed ping: {item!r}")
+    return ping
+
+
+def parse_ndjson(body: bytes, now: float) -> Tuple[List[Ping], int]:
+    """Parse one ping per line; returns (pings, rejected line count)."""
+    pings: List[Ping] = []
+    rejected = 0
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            pings.append(parse_ping(json.loads(line), now))
+        except (BadPing, ValueError):
+            rejected += 1
+    return pings, rejected
+
+
+class DriverTelemetry:
+    """Latest position plus a bounded history per driver, in flat ring buffers.
+
+    Each driver owns a fixed slot of `history` entries inside three `array('d')`
+    buffers (lat, lon, ts), so ingestion never allocates per ping.
+    """
+
+    def __init__(self, driver_ids: Sequence[str], history: int = TELEMETRY_HISTORY_SIZE):
+        self.history = history
+        self._slots: Dict[str, int] = {driver_id: i for i, driver_id in enumerate(driver_ids)}
+        size = len(self._slots) * history
+        self._lat = array("d", bytes(8 * size))
+        self._lon = array("d", bytes(8 * size))
+        self._ts = array("d", bytes(8 * size))
+        self._head = array("I", bytes(4 * len(self._slots)))
+        self._count = array("I", bytes(4 * len(self._slots)))
+        # Bumped whenever a ping is stored, so readers can cache views of the latest positions.
+        self.version = 0
+
+    def __contains__(self, driver_id: str) -> bool:
+        return driver_id in self._slots
+
+    def ingest(self, pings: Iterable[Ping]) -> Tuple[int, Set[str]]:
+        """Store pings; returns (accepted count, ids of drivers that moved)."""
+        slots, cap = self._slots, self.history
+        lat_buf, lon_buf, ts_buf = self._lat, self._lon, self._ts
+        heads, counts = self._head, self._count
+        touched: Set[str] = set()
+        accepted = 0
+        for driver_id, lat, lon, ts in pings:
+            slot = slots.get(driver_id)
+            if slot is None:
+                continue
+            head = heads[slot]
+            idx = slot * cap + head
+            lat_buf[idx] = lat
+            lon_buf[idx] = lon
+            ts_buf[idx] = ts
+            heads[slot] = head + 1 if head + 1 < cap else 0
+            if counts[slot] < cap:
+                counts[slot] += 1
+            touched.add(driver_id)
+            accepted += 1
+        self.version += accepted
+        return accepted, touched
+
+    def latest(self, driver_id: str) -> Optional[Tuple[float, float, float]]:
+        slot = self._slots.get(driver_id)
+        if slot is None or not self._count[slot]:
+            return None
+        idx = slot * self.history + (self._head[slot] - 1) % self.history
+        return self._lat[idx], self._lon[idx], self._ts[idx]
+
+    def track(self, driver_id: str) -> List[Tuple[float, float, float]]:
+        """Stored positions for a driver, oldest first."""
+        slot = self._slots.get(driver_id)
+        if slot is None:
+            return []
+        count, head, cap = self._count[slot], self._head[slot], self.history
+        base = slot * cap
+        points = []
+        for offset in range(count):
+            idx = base + (head - count + offset) % cap
+            points.append((self._lat[idx], self._lon[idx], self._ts[idx]))
+        return points
+
+
+@dataclass
+class ActiveSegment:
+    order_id: str
+    segment_index: int
+    driver_id: str
+    to_name: str
+    to_lat: float
+    to_lon: float
+    speed_kmph: float
+    handling_min: float
+    eta_minutes: float
+    remaining_km: float = 0.0
+    pushed_eta: Optional[float] = None
+    pushed_at: float = 0.0
+
+
+class EtaTracker:
+    """Remaining-ETA for the segment each driver is currently carrying.
+
+    Only drivers that sent pings are recomputed, and only for their own active
+    segments; updates leave through `refresh` at most once per order per
+    `interval` seconds.
+    """
+
+    def __init__(self, interval: float = ETA_PUSH_INTERVAL_S, min_change: float = ETA_MIN_CHANGE_MIN):
+        self.interval = interval
+        self.min_change = min_change
+        self.by_order: Dict[str, ActiveSegment] = {}
+        self.by_driver: Dict[str, Dict[str, ActiveSegment]] = {}
+
+    def track(self, order_id: str, segment_index: int, segment: RouteSegmentOut) -> None:
+        self.untrack(order_id)
+        vehicle = VEHICLE_TYPES[segment.vehicle_type]
+        active = ActiveSegment(
+            order_id=order_id,
+            segment_index=segment_index,
+            driver_id=segment.driver.id,
+            to_name=segment.to.name,
+            to_lat=segment.to.lat,
+            to_lon=segment.to.lon,
+            speed_kmph=vehicle["speed_kmph"],
+            handling_min=vehicle["handling_time_min"],
+            eta_minutes=segment.eta_minutes,
+            remaining_km=segment.distance_km,
+        )
+        self.by_order[order_id] = active
+        self.by_driver.setdefault(active.driver_id, {})[order_id] = active
+
+    def untrack(self, order_id: str) -> None:
+        active = self.by_order.pop(order_id, None)
+        if active is None:
+            return
+        carried = self.by_driver.get(active.driver_id)
+        if carried is not None:
+            carried.pop(order_id, None)
+            if not carried:
+                del self.by_driver[active.driver_id]
+
+    def refresh(self, driver_ids: Iterable[str], telemetry: DriverTelemetry, now: Optional[float] = None) -> List[Dict]:
+        """Recompute ETAs for the given drivers and return the updates due for pushing."""
+        now = time.time() if now is None else now
+        updates: List[Dict] = []
+        for driver_id in driver_ids:
+            carried = self.by_driver.get(driver_id)
+            if not carried:
+                continue
+            position = telemetry.latest(driver_id)
+            if position is None:
+                continue
+            lat, lon, ts = position
+            for active in carried.values():
+                active.remaining_km = haversine_km((lat, lon), (active.to_lat, active.to_lon))
+                active.eta_minutes = active.remaining_km / active.speed_kmph * 60 + active.handling_min
+                if now - active.pushed_at < self.interval:
+                    continue
+                if active.pushed_eta is not None and abs(active.eta_minutes - active.pushed_eta) < self.min_change:
+                    continue
+                active.pushed_eta = active.eta_minutes
+                active.pushed_at = now
+                updates.append({
+                    "order_id": active.order_id,
+                    "segment_index": active.segment_index,
+                    "driver_id": driver_id,
+                    "lat": lat,
+                    "lon": lon,
+                    "ts": ts,
+                    "next_checkpoint": active.to_name,
+                    "remaining_km": round(active.remaining_km, 2),
+                    "eta_minutes": round(active.eta_minutes, 1),
+                })
+        return updates
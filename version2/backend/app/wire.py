@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # the server then only offers JSON
+    msgpack = None
+
+# Stable codes for the compact envelope `[code, epoch_ms, data]`. Append new
+# events; never renumber, clients keep their own copy of the table.
+EVENT_CODES: Dict[str, int] = {
+    "connected": 1,
+    "pong": 2,
+    "subscribed": 3,
+    "order_created": 10,
+    "order_status_changed": 11,
+    "order_checkpoint_reached": 12,
+    "order_rerouted": 13,
+    "order_reroute_failed": 14,
+    "network_status_changed": 15,
+    "eta_updated": 20,
+    "stats_delta": 30,
+}
+EVENT_NAMES: Dict[int, str] = {code: name for name, code in EVENT_CODES.items()}
+
+ENCODINGS = ("json", "msgpack") if msgpack is not None else ("json",)
+
+Frame = Union[str, bytes]
+
+
+class Codec(NamedTuple):
+    """How one /ws connection wants its events framed.
+
+    `json` keeps the original `{"type", "data", "timestamp"}` text envelope;
+    `msgpack` sends `[code, epoch_ms, data]` as a binary frame. Compression is
+    left to the transport: uvicorn negotiates RFC 7692 permessage-deflate with
+    clients that offer it (all browsers do), for either encoding.
+    """
+
+    encoding: str = "json"
+
+    def describe(self) -> Dict[str, Any]:
+        return {"encoding": self.encoding, "event_codes": EVENT_CODES}
+
+
+DEFAULT_CODEC = Codec()
+
+
+def negotiate(encoding: Optional[str]) -> Codec:
+    """Closest supported codec: unknown or unavailable encodings fall back to JSON."""
+    encoding = (encoding or "").lower()
+    return Codec(encoding=encoding if encoding in ENCODINGS else "json")
+
+
+def encode(codec: Codec, event_type: str, data: Any, ts: float) -> Frame:
+    """Frame one event; `ts` is epoch seconds."""
+    if codec.encoding == "msgpack":
+        return msgpack.packb([EVENT_CODES.get(event_type, event_type), int(ts * 1000), data], use_bin_type=True)
+    envelope = {
+        "type": event_type,
+        "data": data,
+        "timestamp": datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat(),
+    }
+    return json.dumps(envelope, separators=(",", ":"), ensure_ascii=False)
+
+
+def decode(codec: Codec, frame: Frame) -> Any:
+    """Inverse of `encode` up to the envelope: the parsed JSON object or MessagePack array.
+
+    Text frames are always read as JSON, so clients may keep sending plain
+    JSON control messages whatever codec they negotiated.
+    """
+    if isinstance(frame, str):
+        return json.loads(frame)
+    if codec.encoding == "msgpack":
+        return msgpack.unpackb(frame, raw=False)
+    return json.loads(frame)
+
+
+def frame_size(frame: Frame) -> int:
+    return len(frame) if isinstance(frame, bytes) else len(frame.encode("utf-8"))
@@ -0,0 +1,56 @@
+"""Compare k alternative routes from one search against k separately seeded quotes.
+
+Run from `backend/`:
+
+    python -m benchmarks.bench_alternatives --k 4 --repeat 20
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from app import synth
+from app.data import DEFAULT_DRIVERS_PER_DISTRICT, DEFAULT_WAREHOUSES_PER_DISTRICT
+from app.routing import RouteNotFound, build_graph, plan_route
+
+PAIRS = [("chennai", "salem"), ("chennai", "vellore"), ("madurai", "tirunelveli"), ("coimbatore", "erode")]
+
+
+def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-hops", type=int, default=12)
+    args = parser.parse_args()
+
+    warehouses = synth.generate_warehouses(per_district=DEFAULT_WAREHOUSES_PER_DISTRICT)
+    drivers = synth.generate_drivers(warehouses, per_district=DEFAULT_DRIVERS_PER_DISTRICT)
+    graph = build_graph(warehouses)
+
+    def quote(origin: str, destination: str, **kwargs):
+        try:
+            return plan_route(graph, warehouses, drivers, "cost", origin, destination, max_hops=args.max_hops, **kwargs)
+        except RouteNotFound:
+            return None
+
+    print(f"{'pair':<26}{'k seeded quotes':>18}{'alternatives=k':>18}{'speedup':>10}")
+    for origin, destination in PAIRS:
+        separate = _time(
+            lambda: [quote(origin, destination, seed=2025 + i) for i in range(args.k)], args.repeat
+        )
+        shared = _time(lambda: quote(origin, destination, alternatives=args.k), args.repeat)
+        print(f"{origin + '->' + destination:<26}{separate:>15.1f} ms{shared:>15.1f} ms{separate / shared:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Event log append throughput (events/sec) with durability, and replay speed.
+
+Run from `backend/`:
+
+    python -m benchmarks.bench_eventlog --events 20000 --concurrency 1,16,256
+    python -m benchmarks.bench_eventlog --dir /mnt/data/bench   # measure on the real volume
+
+Each run starts N asyncio producers that append and await durability, like
+concurrent request handlers. `fsync/event` caps each commit at one record, the
+cost without group commit; `group commit` is the shipped configuration;
+`no fsync` shows the ceiling when only the page cache is written.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from app import metrics
+from app.eventlog import GROUP_COMMIT_MAX_EVENTS, EventLog
+
+MODES = {
+    "fsync/event": {"fsync": True, "max_batch": 1},
+    "group commit": {"fsync": True, "max_batch": GROUP_COMMIT_MAX_EVENTS},
+    "no fsync": {"fsync": False, "max_batch": GROUP_COMMIT_MAX_EVENTS},
+}
+
+
+def custody_event(i: int) -> Dict:
+    """Roughly the size of a logged checkpoint/custody handoff."""
+    return {
+        "order_id": f"{i:08d}-4c1b-4f5e-9a57-3f0e5c7d2b11",
+        "index": i % 6 + 1,
+        "status": "in_progress",
+        "checkpoint": f"Hub {i % 111}",
+        "from_driver": f"DRV-chennai-{i % 8}",
+        "to_driver": f"DRV-salem-{(i + 3) % 8}",
+    }
+
+
+async def produce(log: EventLog, events: int, concurrency: int) -> List[float]:
+    latencies: List[float] = []
+    per_producer = events // concurrency
+
+    async def producer(offset: int) -> None:
+        for i in range(per_producer):
+            started = time.perf_counter()
+            await log.append("order_checkpoint_reached", custody_event(offset + i))
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(producer(p * per_producer) for p in range(concurrency)))
+    return latencies
+
+
+def run(directory: Path, mode: str, events: int, concurrency: int) -> None:
+    shutil.rmtree(directory, ignore_errors=True)
+    log = EventLog(directory, snapshot_every=10 ** 9, **MODES[mode])
+    log.recover()
+    log.start()
+    commits_before = metrics.EVENT_LOG_BATCH_SIZE.count()
+    started = time.perf_counter()
+    latencies = asyncio.run(produce(log, events, concurrency))
+    elapsed = time.perf_counter() - started
+    log.close()
+    commits = metrics.EVENT_LOG_BATCH_SIZE.count() - commits_before
+    latencies.sort()
+    print(f"{mode:<14}{concurrency:>6}{len(latencies) / elapsed:>14,.0f}{len(latencies) / max(commits, 1):>12.1f}"
+          f"{latencies[len(latencies) // 2] * 1000:>10.2f}{latencies[int(len(latencies) * 0.99)] * 1000:>10.2f}")
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--concurrency", default="1,16,256")
+    parser.add_argument("--dir", help="Directory to write the log in (default: a temp dir)")
+    args = parser.parse_args()
+
+    base = Path(args.dir) if args.dir else Path(tempfile.mkdtemp(prefix="eventlog-bench-"))
+    directory = base / "events"
+    print(f"{args.events:,} custody events per run in {directory}")
+    print(f"{'mode':<14}{'prod.':>6}{'events/s':>14}{'per fsync':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    try:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            for mode in MODES:
+                # One fsync per event is slow enough that a fraction of the run shows the rate.
+                events = args.events // 10 if mode == "fsync/event" else args.events
+                run(directory, mode, max(events, concurrency), concurrency)
+
+        started = time.perf_counter()
+        _, tail = EventLog(directory).recover()
+        elapsed = time.perf_counter() - started
+        print(f"\nreplay: {len(tail):,} events in {elapsed * 1000:.0f} ms ({len(tail) / elapsed:,.0f} events/s)")
+    finally:
+        if not args.dir:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,98 @@
+"""Reroute latency after a hub outage against the number of affected orders.
+
+Run from `backend/`:
+
+    python -m benchmarks.bench_reroute --orders 250,1000,4000 --repeat 3
+
+Orders are planned between random district pairs and advanced to a random
+checkpoint, indexed the way the app indexes them, and then the hub with the
+most orders still ahead of it is closed. `cold` re-plans with an empty
+seeded-graph cache (the first outage after startup); `warm` is every outage
+after that.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from app import routing, synth
+from app.data import DEFAULT_DRIVERS_PER_DISTRICT, DEFAULT_WAREHOUSES_PER_DISTRICT
+from app.reroute import RouteIndex, remaining_path, reroute_orders
+from app.routing import RouteNotFound, build_graph, plan_route, set_warehouse_status
+from app.schemas import OrderOut, OrderRequest, RoutePlanOut
+
+DISTINCT_ROUTES = 400
+
+
+def make_orders(graph, warehouses, drivers, count: int, max_hops: int, rng: random.Random) -> List[OrderOut]:
+    """`count` orders drawn from a pool of planned routes, each at a random checkpoint."""
+    districts = sorted({wh.district_code for wh in warehouses})
+    pool = []
+    while len(pool) < min(count, DISTINCT_ROUTES):
+        origin, destination = rng.sample(districts, 2)
+        request = OrderRequest(origin_district=origin, destination_district=destination,
+                               priority=rng.choice(["cost", "time"]), max_hops=max_hops)
+        try:
+            plan = plan_route(graph, warehouses, drivers, request.priority, origin, destination,
+                              max_hops=max_hops, seed=2025)
+        except RouteNotFound:
+            continue
+        pool.append((request, RoutePlanOut.model_validate(plan)))
+
+    orders = []
+    for i in range(count):
+        request, plan = pool[i % len(pool)]
+        checkpoint = rng.randrange(max(len(plan.checkpoints) - 1, 1))
+        orders.append(OrderOut(id=f"ORD-{i:06d}", request=request, plan=plan, current_checkpoint=checkpoint,
+                               status="in_progress" if checkpoint else "created"))
+    return orders
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", default="250,1000,4000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=int, default=DEFAULT_WAREHOUSES_PER_DISTRICT)
+    args = parser.parse_args()
+
+    warehouses = synth.generate_warehouses(per_district=args.scale)
+    drivers = synth.generate_drivers(warehouses, per_district=DEFAULT_DRIVERS_PER_DISTRICT)
+    graph = build_graph(warehouses)
+    sizes = [int(n) for n in args.orders.split(",")]
+    all_orders = make_orders(graph, warehouses, drivers, max(sizes), 4 * args.scale, random.Random(7))
+    print(f"{len(warehouses)} warehouses, {max(sizes):,} orders from "
+          f"{min(max(sizes), DISTINCT_ROUTES)} planned routes")
+    print(f"{'orders':>8}{'affected':>10}{'failed':>8}{'cold ms':>10}{'warm ms':>10}{'warm ms/order':>15}")
+
+    for size in sizes:
+        orders: Dict[str, OrderOut] = {order.id: order for order in all_orders[:size]}
+        index = RouteIndex()
+        for order in orders.values():
+            index.index(order.id, remaining_path(order))
+        busiest = max(index.by_warehouse, key=lambda wh: len(index.by_warehouse[wh]))
+        affected = sorted(index.orders_for_warehouse(busiest))
+
+        set_warehouse_status(graph, busiest, "closed")
+        try:
+            with routing._SEEDED_GRAPHS_LOCK:
+                routing._SEEDED_GRAPHS.clear()
+            started = time.perf_counter()
+            _, failed = reroute_orders(affected, orders, graph, warehouses, drivers)
+            cold = (time.perf_counter() - started) * 1000
+            samples = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                reroute_orders(affected, orders, graph, warehouses, drivers)
+                samples.append((time.perf_counter() - started) * 1000)
+        finally:
+            set_warehouse_status(graph, busiest, "ok")
+        warm = statistics.median(samples)
+        print(f"{size:>8,}{len(affected):>10,}{len(failed):>8,}{cold:>10.1f}{warm:>10.1f}"
+              f"{warm / max(len(affected), 1):>15.3f}")
+
+
+if __name__ == "__main__":
+    main_cli()
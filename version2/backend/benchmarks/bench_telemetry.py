@@ -0,0 +1,85 @@
+"""Driver telemetry ingestion throughput (pings/sec) on one process.
+
+Run from `backend/`:
+
+    python -m benchmarks.bench_telemetry --pings 200000 --batch 500
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+
+from app import synth
+from app.data import DEFAULT_DRIVERS_PER_DISTRICT, DEFAULT_WAREHOUSES_PER_DISTRICT
+from app.schemas import RouteSegmentOut
+from app.telemetry import DriverTelemetry, EtaTracker, parse_ndjson, parse_ping
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pings", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    warehouses = synth.generate_warehouses(per_district=DEFAULT_WAREHOUSES_PER_DISTRICT)
+    drivers = synth.generate_drivers(warehouses, per_district=DEFAULT_DRIVERS_PER_DISTRICT)
+    telemetry = DriverTelemetry([d.id for d in drivers])
+    tracker = EtaTracker()
+    # Every driver carries one active segment towards a random hub.
+    for i, driver in enumerate(drivers):
+        to = rng.choice(warehouses)
+        tracker.track(f"order-{i}", 0, RouteSegmentOut.model_validate({
+            "from": warehouses[0].__dict__, "to": to.__dict__, "vehicle_type": driver.vehicle_type,
+            "driver": driver.__dict__, "distance_km": 50.0, "eta_minutes": 60.0, "cost_inr": 100.0,
+            "handoff_checkpoint": to.name,
+        }))
+
+    now = time.time()
+    rows = [
+        [d.id, 8.0 + rng.random() * 5.5, 76.2 + rng.random() * 4.2, now + i * 0.001]
+        for i, d in enumerate(rng.choice(drivers) for _ in range(args.pings))
+    ]
+    batches = [rows[i:i + args.batch] for i in range(0, len(rows), args.batch)]
+    ndjson = [
+        "\n".join(json.dumps({"driver_id": r[0], "lat": r[1], "lon": r[2], "ts": r[3]}) for r in b).encode()
+        for b in batches
+    ]
+    ws_frames = [json.dumps({"pings": b}) for b in batches]
+
+    def run(label, fn):
+        started = time.perf_counter()
+        for idx in range(len(batches)):
+            fn(idx)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<34}{args.pings / elapsed:>12,.0f} pings/s")
+
+    def store_only(idx):
+        telemetry.ingest(tuple(r) for r in batches[idx])
+
+    def store_and_eta(idx):
+        _, moved = telemetry.ingest(tuple(r) for r in batches[idx])
+        tracker.refresh(moved, telemetry)
+
+    def websocket_path(idx):
+        stamp = time.time()
+        pings = [parse_ping(item, stamp) for item in json.loads(ws_frames[idx])["pings"]]
+        _, moved = telemetry.ingest(pings)
+        tracker.refresh(moved, telemetry)
+
+    def ndjson_path(idx):
+        pings, _ = parse_ndjson(ndjson[idx], time.time())
+        _, moved = telemetry.ingest(pings)
+        tracker.refresh(moved, telemetry)
+
+    print(f"{len(drivers)} drivers, {args.pings:,} pings in batches of {args.batch}")
+    run("ring buffers only", store_only)
+    run("ring buffers + ETA refresh", store_and_eta)
+    run("WebSocket frame -> ETA", websocket_path)
+    run("NDJSON body -> ETA", ndjson_path)
+
+
+if __name__ == "__main__":
+    main()
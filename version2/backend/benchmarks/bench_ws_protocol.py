@@ -0,0 +1,142 @@
+"""/ws wire protocol: bytes per event and server CPU per 10k events, per codec.
+
+Run from `backend/` (needs `pip install msgpack` for the binary codecs):
+
+    python -m benchmarks.bench_ws_protocol --events 10000 --clients 25
+
+A realistic event stream is recorded from the app first (orders, checkpoints,
+driver pings, a warehouse outage with reroutes, dashboard deltas), then
+replayed through every codec. `server CPU` is process time to frame the
+events once, which is what a broadcast costs with the per-codec frame cache.
+The `+deflate` rows emulate the transport's permessage-deflate (one
+compressor with context takeover per connection, as uvicorn negotiates it):
+smaller frames, but the compression work is repeated for every client.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+import zlib
+from typing import Dict, List, Tuple
+
+from app import main, wire
+from app.data import DEFAULT_WAREHOUSES_PER_DISTRICT
+from benchmarks.suite import Network, serving
+
+Event = Tuple[str, object]
+
+# zlib's default level, which the websockets implementation behind uvicorn uses.
+TRANSPORT_DEFLATE_LEVEL = 6
+
+
+def record_events() -> List[Event]:
+    """Drive the app in-process on fresh state and capture what a dashboard subscribed to every topic receives."""
+    rng = random.Random(11)
+    events: List[Event] = []
+    with serving(Network(DEFAULT_WAREHOUSES_PER_DISTRICT)) as client, client.websocket_connect("/ws") as ws:
+        main.ETA_TRACKER.interval = 0.0
+        ws.receive_json()
+        for topic in ("eta", "stats"):
+            ws.send_text(json.dumps({"type": "subscribe", "topic": topic}))
+            ws.receive_json()
+
+        def drain(count: int) -> None:
+            for _ in range(count):
+                message = ws.receive_json()
+                events.append((message["type"], message["data"]))
+
+        order_ids = []
+        pairs = [("chennai", "salem"), ("chennai", "vellore"), ("salem", "chennai"), ("vellore", "chennai")]
+        for i in range(24):
+            origin, destination = pairs[i % len(pairs)]
+            response = client.post("/orders", json={
+                "customer_name": f"Bench {i}", "origin_district": origin, "destination_district": destination,
+                "priority": rng.choice(["cost", "time"]),
+                "max_hops": 4 * DEFAULT_WAREHOUSES_PER_DISTRICT,
+            })
+            response.raise_for_status()
+            order_ids.append(response.json()["id"])
+            drain(2)  # order_created, stats_delta
+
+        for order_id in order_ids[::2]:
+            client.post(f"/orders/{order_id}/checkpoint")
+            drain(2)  # order_checkpoint_reached, stats_delta
+        for order_id in order_ids[1:6:2]:
+            client.patch(f"/orders/{order_id}/status", params={"status": "in_progress"})
+            drain(2)  # order_status_changed, stats_delta
+
+        for _ in range(6):
+            pings = []
+            for order_id in order_ids:
+                segment = main.ETA_TRACKER.by_order.get(order_id)
+                if segment is not None:
+                    pings.append({"driver_id": segment.driver_id, "lat": segment.to_lat + rng.uniform(-0.5, 0.5),
+                                  "lon": segment.to_lon + rng.uniform(-0.5, 0.5)})
+            result = client.post("/telemetry", content="\n".join(json.dumps(p) for p in pings)).json()
+            drain(result["eta_updates"])
+
+        busiest = max(main.ROUTE_INDEX.by_warehouse, key=lambda wh: len(main.ROUTE_INDEX.by_warehouse[wh]))
+        result = client.put(f"/network/warehouses/{busiest}/status", json={"status": "closed", "reason": "bench"})
+        outcome = result.json()
+        drain(1 + len(outcome["rerouted"]) + len(outcome["failed"]) + (1 if outcome["rerouted"] else 0))
+    return events
+
+
+def transport_deflate(frames: List[bytes], clients: int, session: int) -> Tuple[int, float]:
+    """Emulate RFC 7692 permessage-deflate with context takeover: one compressor per connection.
+
+    Compressors restart every `session` frames so the replayed copies of the
+    recorded stream do not compress against themselves.
+    """
+    started = time.process_time()
+    sent = 0
+    for start in range(0, len(frames), session):
+        compressors = [zlib.compressobj(TRANSPORT_DEFLATE_LEVEL, zlib.DEFLATED, -15) for _ in range(clients)]
+        for frame in frames[start:start + session]:
+            for compressor in compressors:
+                sent += len(compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return sent // clients, time.process_time() - started
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--clients", type=int, default=25)
+    args = parser.parse_args()
+
+    recorded = record_events()
+    stream = [recorded[i % len(recorded)] for i in range(args.events)]
+    kinds: Dict[str, int] = {}
+    for event_type, _ in recorded:
+        kinds[event_type] = kinds.get(event_type, 0) + 1
+    print(f"recorded {len(recorded)} events: " + ", ".join(f"{k}={v}" for k, v in sorted(kinds.items())))
+    print(f"replaying {args.events:,} events; per-10k CPU scaled from that run\n")
+    print(f"{'codec':<30}{'bytes/event':>12}{'vs json':>9}{'CPU ms/10k':>12}{'fan-out CPU ms/10k':>20}")
+
+    scale = 10_000 / args.events
+    baseline = None
+    now = time.time()
+    for encoding in wire.ENCODINGS:
+        codec = wire.Codec(encoding)
+        started = time.process_time()
+        frames = [wire.encode(codec, event_type, data, now) for event_type, data in stream]
+        cpu = time.process_time() - started
+        for (event_type, data), frame in zip(recorded, frames):
+            decoded = wire.decode(codec, frame)
+            assert (decoded["data"] if encoding == "json" else decoded[2]) == data, event_type
+        size = sum(wire.frame_size(f) for f in frames) / len(frames)
+        baseline = baseline or size
+        print(f"{encoding:<30}{size:>12.1f}{size / baseline:>8.0%} {cpu * 1000 * scale:>11.1f}"
+              f"{cpu * 1000 * scale:>20.1f}")
+
+        plain = [f.encode("utf-8") if isinstance(f, str) else f for f in frames]
+        deflated, deflate_cpu = transport_deflate(plain, args.clients, len(recorded))
+        label = f"{encoding}+deflate x{args.clients} clients"
+        print(f"{label:<30}{deflated / len(plain):>12.1f}{deflated / len(plain) / baseline:>8.0%} "
+              f"{(cpu + deflate_cpu / args.clients) * 1000 * scale:>11.1f}"
+              f"{(cpu + deflate_cpu) * 1000 * scale:>20.1f}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,251 @@
+"""Routing and API benchmark suite with baseline regression tracking.
+
+Run from `backend/` (needs `pip install -r benchmarks/requirements.txt`):
+
+    python -m benchmarks.suite                      # run, write results, compare to baseline
+    python -m benchmarks.suite --scales 3,6,12      # warehouses per district to benchmark
+    python -m benchmarks.suite --save-baseline      # accept the current numbers as the baseline
+
+Each case is timed at every scale of the synthetic network. Results are written
+as JSON to `benchmarks/results/latest.json`; cases whose median is more than
+`--threshold` slower than `benchmarks/baseline.json` are reported and make the
+command exit non-zero.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from app import main, synth
+from app.data import DEFAULT_DRIVERS_PER_DISTRICT, VEHICLE_TYPES
+from app.geo import GeoIndex
+from app.reroute import RouteIndex
+from app.rollups import RollupEngine
+from app.routing import RouteNotFound, best_vehicle_for_edge, build_graph, plan_route
+from app.schemas import WarehouseOut
+from app.telemetry import DriverTelemetry, EtaTracker
+
+HERE = Path(__file__).resolve().parent
+BASELINE_PATH = HERE / "baseline.json"
+RESULTS_PATH = HERE / "results" / "latest.json"
+
+SHORT_PAIR = ("chennai", "vellore")
+LONG_PAIR = ("chennai", "salem")
+WS_CLIENTS = (1, 25)
+
+
+class Network:
+    """Synthetic network at one scale (warehouses per district)."""
+
+    def __init__(self, per_district: int):
+        self.per_district = per_district
+        self.warehouses = synth.generate_warehouses(per_district=per_district)
+        self.drivers = synth.generate_drivers(self.warehouses, per_district=DEFAULT_DRIVERS_PER_DISTRICT)
+        self.graph = build_graph(self.warehouses)
+
+    def plan(self, pair, priority: str = "cost", max_hops: Optional[int] = None, **kwargs) -> Optional[Dict]:
+        try:
+            return plan_route(
+                self.graph, self.warehouses, self.drivers, priority, pair[0], pair[1],
+                max_hops=max_hops or 6 * self.per_district, **kwargs
+            )
+        except RouteNotFound:
+            return None
+
+
+@contextmanager
+def serving(net: Network) -> Iterator:
+    """Point the FastAPI app at `net` and yield an in-process client (same event loop for HTTP and /ws).
+
+    All app state is swapped for fresh instances and restored afterwards. The
+    event log is switched off, so an `EVENT_LOG_DIR` from `.env` never
+    receives benchmark orders.
+    """
+    from fastapi.testclient import TestClient
+
+    telemetry = DriverTelemetry([d.id for d in net.drivers])
+    fresh = {
+        "WAREHOUSES": net.warehouses,
+        "DRIVERS": net.drivers,
+        "GRAPH": net.graph,
+        "ORDERS": {},
+        "ORDER_IDS": [],
+        "ROUTE_INDEX": RouteIndex(),
+        "TELEMETRY": telemetry,
+        "ETA_TRACKER": EtaTracker(),
+        "GEO_INDEX": GeoIndex(net.warehouses, net.drivers, net.graph, telemetry),
+        "ROLLUPS": RollupEngine(),
+        "EVENT_LOG": None,
+    }
+    saved = {name: getattr(main, name) for name in fresh}
+    for name, value in fresh.items():
+        setattr(main, name, value)
+    try:
+        with TestClient(main.app) as client:
+            yield client
+    finally:
+        for name, value in saved.items():
+            setattr(main, name, value)
+
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "min_ms": round(samples[0], 4),
+        "repeat": repeat,
+    }
+
+
+def routing_cases(net: Network, repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {
+        "build_graph": measure(lambda: build_graph(net.warehouses), repeat),
+        "build_graph.seeded": measure(lambda: build_graph(net.warehouses, seed=7), repeat),
+    }
+    for label, pair in (("short", SHORT_PAIR), ("long", LONG_PAIR)):
+        for priority in ("cost", "time"):
+            results[f"plan_route.{label}.{priority}"] = measure(lambda: net.plan(pair, priority), repeat)
+    for max_hops in (4, 8, 16, 32):
+        results[f"plan_route.long.max_hops_{max_hops}"] = measure(
+            lambda: net.plan(LONG_PAIR, max_hops=max_hops), repeat
+        )
+
+    availability = {v: 3 for v in VEHICLE_TYPES}
+    distances = [5.0 * i for i in range(1, 150)]
+
+    def vehicle_sweep():
+        for distance in distances:
+            best_vehicle_for_edge("chennai", distance, availability, "cost", 1.02)
+            best_vehicle_for_edge("chennai", distance, availability, "time", 1.02)
+
+    # Reported per call, not per sweep.
+    sweep = measure(vehicle_sweep, repeat * 10)
+    calls = len(distances) * 2
+    results["best_vehicle_for_edge"] = {
+        k: (round(v / calls, 6) if k.endswith("_ms") else v) for k, v in sweep.items()
+    }
+
+    results["catalog.warehouses.serialize"] = measure(
+        lambda: json.dumps([WarehouseOut(**w.__dict__).model_dump() for w in net.warehouses]), repeat
+    )
+    results["catalog.drivers.serialize"] = measure(lambda: json.dumps([d.__dict__ for d in net.drivers]), repeat)
+    return results
+
+
+def api_cases(net: Network, repeat: int) -> Dict[str, Dict[str, float]]:
+    # Denser networks need more hops between the same districts.
+    body = {"origin_district": LONG_PAIR[0], "destination_district": LONG_PAIR[1], "max_hops": 6 * net.per_district}
+    results: Dict[str, Dict[str, float]] = {}
+    with serving(net) as client:
+        client.post("/quote", json=body).raise_for_status()
+        results["api.quote"] = measure(lambda: client.post("/quote", json=body), repeat)
+        results["api.orders.create"] = measure(lambda: client.post("/orders", json=body), repeat)
+        results["api.orders.list"] = measure(lambda: client.get("/orders"), repeat)
+        results["api.catalog.warehouses"] = measure(lambda: client.get("/catalog/warehouses"), repeat)
+
+        for count in WS_CLIENTS:
+            sockets = [client.websocket_connect("/ws").__enter__() for _ in range(count)]
+            try:
+                for ws in sockets:
+                    ws.receive_json()  # "connected"
+
+                def fan_out():
+                    client.post("/orders", json=body).raise_for_status()
+                    for ws in sockets:
+                        while ws.receive_json()["type"] != "order_created":
+                            pass
+
+                results[f"api.ws.fan_out_{count}"] = measure(fan_out, repeat)
+            finally:
+                for ws in sockets:
+                    ws.__exit__(None, None, None)
+    return results
+
+
+def run(scales: List[int], repeat: int, include_api: bool) -> Dict:
+    cases: Dict[str, Dict[str, float]] = {}
+    for per_district in scales:
+        net = Network(per_district)
+        suffix = f"@{len(net.warehouses)}wh"
+        print(f"scale {suffix} ...", file=sys.stderr)
+        for name, stats in routing_cases(net, repeat).items():
+            cases[name + suffix] = stats
+        if include_api:
+            for name, stats in api_cases(net, repeat).items():
+                cases[name + suffix] = stats
+    return {
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cases": cases,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Print a per-case comparison and return the names of regressed cases."""
+    regressions = []
+    print(f"{'case':<48}{'baseline':>12}{'current':>12}{'delta':>9}")
+    for name, stats in current["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        now = stats["median_ms"]
+        if base is None:
+            print(f"{name:<48}{'-':>12}{now:>9.3f} ms{'new':>9}")
+            continue
+        before = base["median_ms"]
+        delta = (now - before) / before if before else 0.0
+        flag = ""
+        if delta > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<48}{before:>9.3f} ms{now:>9.3f} ms{delta:>+8.0%}{flag}")
+    return regressions
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="3,6", help="comma-separated warehouses per district")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--skip-api", action="store_true", help="only run routing cases")
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s]
+    current = run(scales, args.repeat, include_api=not args.skip_api)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(current, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(current, indent=2))
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"no baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    regressions = compare(current, json.loads(args.baseline.read_text()), args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,299 @@
+"""Event log durability: torn tails, snapshots, segment rollover, failed writes and replay.
+
+Run from `backend/`:
+
+    python -m pytest tests
+"""
+from __future__ import annotations
+
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import eventlog, main
+from app.eventlog import EventLog, _first_seq, read_records
+from app.geo import GeoIndex
+from app.reroute import RouteIndex
+from app.rollups import RollupEngine
+from app.telemetry import DriverTelemetry, EtaTracker
+
+
+def open_log(directory, **kwargs) -> EventLog:
+    log = EventLog(directory, fsync=False, index_key="order_id", **kwargs)
+    log.recover()
+    log.start()
+    return log
+
+
+def append(log: EventLog, *order_ids: str) -> int:
+    """Append one event per order id as a single unit; returns the last seq once durable."""
+    events = [("order_status_changed", {"order_id": oid, "status": "in_progress"}) for oid in order_ids]
+    return log.submit_batch(events).result(5)
+
+
+def seqs(records) -> list:
+    return [record["seq"] for record in records]
+
+
+def fresh_app(monkeypatch, directory) -> None:
+    """Give `main` empty state logging to `directory`, as after a restart; the real singletons come back after the test."""
+    graph = main.GRAPH.copy()
+    graph.graph = {}
+    telemetry = DriverTelemetry([d.id for d in main.DRIVERS])
+    fresh = {
+        "EVENT_LOG": EventLog(directory, fsync=False, index_key="order_id"), "GRAPH": graph, "ORDERS": {},
+        "ORDER_IDS": [], "ROUTE_INDEX": RouteIndex(), "TELEMETRY": telemetry, "ETA_TRACKER": EtaTracker(),
+        "GEO_INDEX": GeoIndex(main.WAREHOUSES, main.DRIVERS, graph, telemetry), "ROLLUPS": RollupEngine(),
+    }
+    for name, value in fresh.items():
+        monkeypatch.setattr(main, name, value)
+
+
+def create_orders(client, count: int) -> list:
+    ids = []
+    for i in range(count):
+        response = client.post("/orders", json={
+            "origin_district": "chennai", "destination_district": "salem", "max_hops": 12,
+            "priority": ["cost", "time"][i % 2],
+        })
+        response.raise_for_status()
+        ids.append(response.json()["id"])
+    return ids
+
+
+def busiest_warehouse() -> str:
+    return max(main.ROUTE_INDEX.by_warehouse, key=lambda wh: len(main.ROUTE_INDEX.by_warehouse[wh]))
+
+
+def test_torn_tail_is_truncated_on_recover(tmp_path):
+    log = open_log(tmp_path)
+    append(log, "a", "b", "c")
+    log.close()
+    (segment,) = log.segments()
+    intact = segment.stat().st_size
+    with open(segment, "ab") as fh:
+        fh.write(b"\x40\x00\x00\x00\x00\x00\x00\x00{\"seq\":4")  # crash mid-write
+
+    state, tail = EventLog(tmp_path).recover()
+    assert state is None
+    assert seqs(tail) == [1, 2, 3]
+    assert segment.stat().st_size == intact
+
+    log = open_log(tmp_path)
+    assert append(log, "d") == 4
+    log.close()
+    assert seqs(EventLog(tmp_path).recover()[1]) == [1, 2, 3, 4]
+
+
+def test_snapshot_plus_tail(tmp_path):
+    log = open_log(tmp_path)
+    append(log, "a", "b", "c", "d", "e")
+    # State built on the snapshot thread, covering only the first three records.
+    log.snapshot(lambda: {"orders": ["a", "b", "c"]}, seq=3)
+    append(log, "f")
+    log.close()
+
+    recovered = EventLog(tmp_path, index_key="order_id")
+    state, tail = recovered.recover()
+    assert state == {"orders": ["a", "b", "c"]}
+    assert seqs(tail) == [4, 5, 6]
+    assert recovered.snapshot_seq == 3
+    assert recovered.next_seq == 7
+    # The index still covers records the snapshot made redundant for replay.
+    assert seqs(recovered.read_indexed("a")) == [1]
+
+
+def test_segment_rollover(tmp_path):
+    log = open_log(tmp_path, segment_bytes=256)
+    for i in range(20):
+        append(log, f"order-{i % 3}")
+    # A unit is never split across segments.
+    append(log, "x", "x", "x", "x", "x", "x")
+    log.close()
+
+    segments = log.segments()
+    assert len(segments) > 2
+    for path in segments:
+        first = [record for _, record in read_records(path)][0]
+        assert int(path.stem.split("-", 1)[1]) == first["seq"]
+    x_segments = {path for path in segments for _, record in read_records(path) if record["data"]["order_id"] == "x"}
+    assert len(x_segments) == 1
+
+    recovered = EventLog(tmp_path, index_key="order_id")
+    _, tail = recovered.recover()
+    assert seqs(tail) == list(range(1, 27))
+    assert seqs(recovered.read_indexed("order-1")) == [2, 5, 8, 11, 14, 17, 20]
+    assert recovered.read_indexed("order-1") == [r for r in recovered.read() if r["data"]["order_id"] == "order-1"]
+
+
+def test_recover_scans_only_segments_after_the_snapshot(tmp_path, monkeypatch):
+    log = open_log(tmp_path, segment_bytes=256)
+    for i in range(20):
+        append(log, f"order-{i % 3}")
+    log.snapshot({"orders": []})
+    append(log, "order-1")
+    log.close()
+    segments = log.segments()
+    assert all(path.with_suffix(".idx").exists() for path in segments[:-1])
+
+    scanned = []
+    real_read_records = eventlog.read_records
+    monkeypatch.setattr(eventlog, "read_records", lambda path: scanned.append(path) or real_read_records(path))
+    recovered = EventLog(tmp_path, index_key="order_id")
+    _, tail = recovered.recover()
+    assert seqs(tail) == [21]
+    # Only the last segment holds records after the snapshot; the full ones are read from their index files.
+    assert len(segments) > 2 and _first_seq(segments[-1]) <= 21
+    assert scanned == segments[-1:]
+    assert seqs(recovered.read_indexed("order-1")) == [2, 5, 8, 11, 14, 17, 20, 21]
+
+    # An index file that no longer matches its segment is ignored and the segment scanned instead.
+    segments[0].with_suffix(".idx").write_text('{"size": 1, "keys": {}}')
+    recovered = EventLog(tmp_path, index_key="order_id")
+    recovered.recover()
+    assert segments[0] in scanned
+    assert seqs(recovered.read_indexed("order-1")) == [2, 5, 8, 11, 14, 17, 20, 21]
+
+
+class TornWrite:
+    """Segment file that writes half of the next write, then fails like a full disk."""
+
+    def __init__(self, fh):
+        self.fh = fh
+
+    def write(self, data):
+        self.fh.write(bytes(data[:len(data) // 2]))
+        self.fh.flush()
+        raise OSError(28, "No space left on device")
+
+    def __getattr__(self, name):
+        return getattr(self.fh, name)
+
+
+def test_failed_write_is_cut_off_before_more_appends(tmp_path):
+    log = open_log(tmp_path)
+    append(log, "a")
+    with log._lock:
+        log._segment = TornWrite(log._segment)
+    with pytest.raises(OSError):
+        append(log, "b", "b")
+    assert append(log, "c") == 4
+    log.close()
+
+    recovered = EventLog(tmp_path, index_key="order_id")
+    _, tail = recovered.recover()
+    assert seqs(tail) == [1, 4]
+    assert recovered.read_indexed("b") == []
+    assert seqs(recovered.read_indexed("c")) == [4]
+
+
+def test_unrepairable_write_refuses_appends(tmp_path, monkeypatch):
+    log = open_log(tmp_path)
+    append(log, "a")
+    monkeypatch.setattr(log, "_open_segment", lambda path: (_ for _ in ()).throw(OSError(5, "I/O error")))
+    with log._lock:
+        log._segment = TornWrite(log._segment)
+    with pytest.raises(OSError):
+        append(log, "b")
+    with pytest.raises(RuntimeError, match="Event log failed"):
+        append(log, "c")
+    log.close()
+
+
+def test_replay_is_idempotent(tmp_path, monkeypatch):
+    fresh_app(monkeypatch, tmp_path)
+    with TestClient(main.app) as client:
+        ids = create_orders(client, 6)
+        for order_id in ids[:3]:
+            client.post(f"/orders/{order_id}/checkpoint").raise_for_status()
+        client.patch(f"/orders/{ids[4]}/status", params={"status": "in_progress"}).raise_for_status()
+        busiest = busiest_warehouse()
+        client.put(f"/network/warehouses/{busiest}/status", json={"status": "closed"}).raise_for_status()
+        client.put(f"/network/warehouses/{busiest}/status", json={"status": "ok"}).raise_for_status()
+        expected = {oid: main.ORDERS[oid].model_dump(mode="json") for oid in main.ORDER_IDS}
+        expected_stats = client.get("/stats").json()
+        assert [r["type"] for r in client.get(f"/orders/{ids[0]}/events").json()][:2] == [
+            "order_created", "order_checkpoint_reached",
+        ]
+
+    # Replaying the whole log on top of the final snapshot, twice, changes nothing.
+    records = list(EventLog(tmp_path).read())
+    state, _ = EventLog(tmp_path).recover()
+    fresh_app(monkeypatch, tmp_path)
+    for data in state["orders"]:
+        main._restore_order(main._load_order(data), ts=0.0)
+    for record in records + records:
+        main._replay_event(record)
+    restored = {oid: main.ORDERS[oid].model_dump(mode="json") for oid in main.ORDER_IDS}
+    assert json.dumps(restored, sort_keys=True) == json.dumps(expected, sort_keys=True)
+    assert main.GRAPH.graph == {"warehouse_status": {}}
+    assert main.ROLLUPS.snapshot()["by_status"] == expected_stats["by_status"]
+    assert main.ROLLUPS.totals == {k: v for k, v in expected_stats["totals"].items() if not k.startswith("avg_")}
+
+
+def test_network_status_survives_restart(tmp_path, monkeypatch):
+    fresh_app(monkeypatch, tmp_path)
+    a, b = next(iter(main.GRAPH.edges()))
+    with TestClient(main.app) as client:
+        client.put(f"/network/warehouses/{main.WAREHOUSES[0].id}/status", json={"status": "closed"}).raise_for_status()
+        client.put(f"/network/edges/{a}/{b}/status", json={"status": "degraded"}).raise_for_status()
+        client.put(f"/network/warehouses/{main.WAREHOUSES[1].id}/status", json={"status": "closed"}).raise_for_status()
+        client.put(f"/network/warehouses/{main.WAREHOUSES[1].id}/status", json={"status": "ok"}).raise_for_status()
+        expected = client.get("/network/status").json()
+    assert len(expected["warehouses"]) == 1 and len(expected["edges"]) == 1
+
+    # First restart replays the logged changes; the second restores them from the snapshot the first one took.
+    for _ in range(2):
+        fresh_app(monkeypatch, tmp_path)
+        with TestClient(main.app) as client:
+            assert client.get("/network/status").json() == expected
+
+
+def test_failed_reroute_round_still_broadcasts_applied_rounds(tmp_path, monkeypatch):
+    fresh_app(monkeypatch, tmp_path)
+    pushed = []
+
+    async def broadcast_update(event_type, data):
+        pushed.append((event_type, data))
+
+    async def publish_stats_delta(delta):
+        pushed.append(("stats_delta", delta))
+
+    record_events = main.record_events
+    reroute_rounds = []
+
+    async def failing_second_round(events, apply):
+        if events and events[0][0] == "order_rerouted":
+            reroute_rounds.append([data["order_id"] for _, data in events])
+            if len(reroute_rounds) == 2:
+                raise HTTPException(status_code=503, detail="Event log unavailable, change not applied: disk full")
+        await record_events(events, apply)
+
+    reroute_orders = main.reroute_orders
+    moved = []
+
+    def reroute_while_one_order_moves(order_ids, *args):
+        plans, failed = reroute_orders(order_ids, *args)
+        if not moved:
+            # One order reaches a checkpoint while the first round is planned, so it needs a second round.
+            moved.append(sorted(plans)[0])
+            main.ORDERS[moved[0]].status = "in_progress"
+        return plans, failed
+
+    with TestClient(main.app) as client:
+        create_orders(client, 6)
+        busiest = busiest_warehouse()
+        assert len(main.ROUTE_INDEX.orders_for_warehouse(busiest)) >= 2
+        monkeypatch.setattr(main, "broadcast_update", broadcast_update)
+        monkeypatch.setattr(main, "publish_stats_delta", publish_stats_delta)
+        monkeypatch.setattr(main, "record_events", failing_second_round)
+        monkeypatch.setattr(main, "reroute_orders", reroute_while_one_order_moves)
+        response = client.put(f"/network/warehouses/{busiest}/status", json={"status": "closed"})
+
+    assert response.status_code == 503
+    assert reroute_rounds[1] == moved
+    assert [data["order_id"] for kind, data in pushed if kind == "order_rerouted"] == reroute_rounds[0]
+    assert [kind for kind, _ in pushed][0] == "network_status_changed"
+    assert [delta for kind, delta in pushed if kind == "stats_delta"][0]["vehicle"]
@@ -0,0 +1,65 @@
+"""Dashboard rollups: sliding-window expiry and restoring orders at ts=0.
+
+Run from `backend/`:
+
+    python -m pytest tests
+"""
+from __future__ import annotations
+
+import pytest
+
+from app import synth
+from app.rollups import WINDOW_FIELDS, RingWindow, RollupEngine
+from app.routing import build_graph, plan_route
+from app.schemas import OrderOut, OrderRequest, RoutePlanOut
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture(scope="module")
+def order() -> OrderOut:
+    warehouses = synth.generate_warehouses(per_district=3)
+    drivers = synth.generate_drivers(warehouses, per_district=2)
+    request = OrderRequest(origin_district="chennai", destination_district="salem", priority="cost", max_hops=12)
+    plan = plan_route(build_graph(warehouses), warehouses, drivers, request.priority,
+                      request.origin_district, request.destination_district, max_hops=request.max_hops, seed=2025)
+    return OrderOut(id="ORD-000001", request=request, plan=RoutePlanOut.model_validate(plan))
+
+
+def test_buckets_expire_once():
+    window = RingWindow(300, 60)
+    window.add(NOW, {"orders_created": 1, "cost_inr": 10.0})
+    window.add(NOW + 150, {"orders_created": 2})
+    assert window.totals(NOW + 150)["orders_created"] == 3
+    # Only the first bucket has left the window; reading again must not subtract it twice.
+    assert window.totals(NOW + 300) == {**dict.fromkeys(WINDOW_FIELDS, 0.0), "orders_created": 2}
+    assert window.totals(NOW + 300)["orders_created"] == 2
+    # Adds older than the window are dropped rather than landing in a recycled bucket.
+    window.add(NOW, {"orders_created": 5})
+    assert window.totals(NOW + 449)["orders_created"] == 2
+    # A jump of many spans clears everything exactly once.
+    assert window.totals(NOW + 10 * 300) == dict.fromkeys(WINDOW_FIELDS, 0.0)
+    window.add(NOW + 10 * 300, {"delivered": 1})
+    assert window.totals(NOW + 10 * 300 + 299)["delivered"] == 1
+
+
+def test_restore_at_zero_counts_in_totals_only(order):
+    rollups = RollupEngine()
+    # Startup: orders are restored at ts=0 before any live traffic.
+    rollups.order_created(order, now=0.0)
+    rollups.status_changed("created", "in_progress", now=0.0)
+    live = rollups.order_created(order.model_copy(update={"id": "ORD-000002"}), now=NOW)
+
+    snapshot = rollups.snapshot(now=NOW)
+    assert snapshot["totals"]["orders"] == 2
+    assert snapshot["by_status"] == {"created": 1, "in_progress": 1}
+    assert live["totals"]["orders"] == 1
+    for totals in snapshot["windows"].values():
+        assert totals["orders_created"] == 1
+        assert totals["status_changes"] == 0
+        assert totals["cost_inr"] == round(order.plan.total_cost_inr, 2)
+
+    # Restoring after the windows are live leaves them untouched too.
+    rollups.order_created(order.model_copy(update={"id": "ORD-000003"}), now=0.0)
+    assert rollups.snapshot(now=NOW)["windows"] == snapshot["windows"]
+    assert rollups.totals["orders"] == 3